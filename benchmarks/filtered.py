@@ -0,0 +1,76 @@
+"""Compare .filtered_() with a domain against filtering in Python.
+
+Usage: python benchmarks/filtered.py -d dbname [odoo options] [-- model field value]
+
+This filters all records of a model (by default res.partner on is_company)
+with a cold cache, once with the single search that .filtered_() uses for
+stored fields and once by comparing attributes like it used to. The value
+is parsed as a Python literal if possible.
+"""
+
+from __future__ import print_function
+
+import ast
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import odoo_repl  # noqa: E402
+
+from odoo_repl import util  # noqa: E402
+from odoo_repl.imports import odoo, BaseModel  # noqa: E402
+
+DEFAULTS = ["res.partner", "is_company", "True"]
+
+
+def filter_in_python(records, field, value):
+    # type: (BaseModel, str, object) -> BaseModel
+    """The old implementation: compare each record's value."""
+    return records.filtered(lambda record: getattr(record, field) == value)
+
+
+def best_of(env, func):
+    # type: (odoo.api.Environment, object) -> float
+    def run():
+        # type: () -> None
+        util.invalidate_cache(env)
+        func()
+
+    return min(timeit.repeat(run, number=1, repeat=5))
+
+
+def main(argv):
+    # type: (list) -> int
+    if "--" in argv:
+        ind = argv.index("--")
+        argv, args = argv[:ind], argv[ind + 1 :]
+    else:
+        args = []
+    model_name, field, text = (args + DEFAULTS[len(args) :])[:3]
+    try:
+        value = ast.literal_eval(text)  # type: object
+    except (ValueError, SyntaxError):
+        value = text
+
+    odoo_repl.parse_config(argv)
+    env = odoo_repl.create_namespace(None)[0]
+    records = env[model_name].with_context(active_test=False).search([])
+    print("{} records of {}".format(len(records), model_name))
+
+    old = filter_in_python(records, field, value)
+    new = records.filtered_(**{field: value})
+    assert old == new, "Results differ"
+    print("{} match {} = {!r}".format(len(new), field, value))
+
+    for label, func in (
+        ("python", lambda: filter_in_python(records, field, value)),
+        ("domain", lambda: records.filtered_(**{field: value})),
+    ):
+        print("{:>8}: {:.3f}s".format(label, best_of(env, func)))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
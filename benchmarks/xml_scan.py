@@ -0,0 +1,113 @@
+"""Compare the single-pass record scan with one tree search per record tag.
+
+Usage: python benchmarks/xml_scan.py [number of records]
+
+This generates a synthetic data file with a mix of record tags and times
+odoo_repl.sources._scan_xml_tree against the approach it replaced, both on
+an already parsed tree and including the time it takes to parse the file.
+"""
+
+from __future__ import print_function
+
+import os
+import random
+import shutil
+import sys
+import tempfile
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import lxml.etree  # noqa: E402
+
+from odoo_repl import sources  # noqa: E402
+
+
+def write_data_file(fname, num_records):
+    # type: (str, int) -> None
+    rng = random.Random(0)
+    with open(fname, "w") as f:
+        f.write('<?xml version="1.0" encoding="utf-8"?>\n<odoo>\n<data>\n')
+        for num in range(num_records):
+            kind = rng.random()
+            if kind < 0.7:
+                f.write('<record id="record_{}" model="res.partner">\n'.format(num))
+                for field in range(5):
+                    f.write(
+                        '    <field name="field_{}">value {}</field>\n'.format(
+                            field, num
+                        )
+                    )
+                f.write("</record>\n")
+            elif kind < 0.9:
+                f.write(
+                    '<menuitem id="menu_{}" name="Menu {}" sequence="{}"/>\n'.format(
+                        num, num, num
+                    )
+                )
+            else:
+                f.write('<template id="template_{}">\n'.format(num))
+                f.write('    <div class="o_{}"><span t-esc="x"/></div>\n'.format(num))
+                f.write("</template>\n")
+        f.write("</data>\n</odoo>\n")
+
+
+def scan_per_tag(module, tree):
+    # type: (str, lxml.etree._ElementTree) -> list
+    """The old implementation: a separate tree search for every tag."""
+    entries = []
+    for tag in sources.RECORD_TAGS:
+        for record in tree.iterfind(".//" + tag):
+            if "id" not in record.attrib:
+                continue
+            entries.append(
+                (
+                    module,
+                    record.attrib["id"],
+                    record.sourceline,
+                    sources._next_line(record),
+                    tag,
+                )
+            )
+    return entries
+
+
+def best_of(func):
+    # type: (object) -> float
+    return min(timeit.repeat(func, number=1, repeat=5))
+
+
+def main(argv):
+    # type: (list) -> int
+    num_records = int(argv[0]) if argv else 50000
+    tmpdir = tempfile.mkdtemp()
+    try:
+        fname = os.path.join(tmpdir, "data.xml")
+        write_data_file(fname, num_records)
+        print(
+            "{} records, {:.1f} MB".format(
+                num_records, os.path.getsize(fname) / 1024.0 / 1024.0
+            )
+        )
+
+        tree = lxml.etree.parse(fname)
+        old = sorted(scan_per_tag("bench", tree))
+        new = sorted(sources._scan_xml_tree("bench", tree))
+        assert old == new, "Results differ"
+
+        parse = best_of(lambda: lxml.etree.parse(fname))
+        print("{:>12}: {:.3f}s".format("parse", parse))
+        for label, func in (
+            ("per tag", scan_per_tag),
+            ("single pass", sources._scan_xml_tree),
+        ):
+            scan = best_of(lambda: func("bench", tree))
+            total = scan + parse
+            print("{:>12}: {:.3f}s scan, {:.3f}s total".format(label, scan, total))
+    finally:
+        shutil.rmtree(tmpdir)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -38,6 +38,7 @@ import threading
 import types
 
 from odoo_repl import addons
+from odoo_repl import color
 from odoo_repl import config
 from odoo_repl import fields
 from odoo_repl import fzf
@@ -49,6 +50,7 @@ from odoo_repl import records
 from odoo_repl import shorthand
 from odoo_repl import sources
 from odoo_repl import util
+from odoo_repl import warmup
 from odoo_repl.imports import PY3, odoo, BaseModel, t, Text, builtins, StringIO, Field
 
 
@@ -153,16 +155,25 @@ def create_namespace(
         }
     )
 
-    if not sources.xml_records:
-        modules = util.sql(
-            env,
-            "SELECT name, demo FROM ir_module_module WHERE state = 'installed'",
-        )
-        xml_thread = threading.Thread(
-            target=lambda: sources.populate_xml_records(modules)
+    if not sources.xml_modules:
+        # Scheduling happens right away so that records can be looked up
+        # before the thread gets to them
+        sources.schedule_xml_records(
+            util.sql(
+                env,
+                "SELECT name, demo FROM ir_module_module WHERE state = 'installed'",
+            )
         )
+        xml_thread = threading.Thread(target=sources.populate_xml_records)
         xml_thread.daemon = True
         xml_thread.start()
+        if config.xml_watch > 0:
+            watch_thread = threading.Thread(
+                target=sources.watch_xml_records, args=(config.xml_watch,)
+            )
+            watch_thread.daemon = True
+            watch_thread.start()
+        warmup.start(env)
 
     return env, namespace
 
@@ -225,17 +236,28 @@ def odoo_repr(obj):
 
 
 @util.patch(BaseModel, "print_")
-def odoo_print(obj, **kwargs):
-    # type: (t.Any, t.Any) -> None
-    if util.is_record(obj) and len(obj) > 1:
-        first = True
-        for record in obj:
-            if not first:
-                print()
-            first = False
-            print(records.record_repr(record), **kwargs)
-    else:
+def odoo_print(obj, pager=None, **kwargs):
+    # type: (t.Any, t.Optional[bool], t.Any) -> None
+    """Print the full representation of an object.
+
+    Recordsets are rendered and printed a chunk at a time. If stdout is a
+    terminal they're sent through a pager, and rendering stops when you
+    quit it. Pass pager=False to print directly.
+    """
+    if not (util.is_record(obj) and len(obj) > 1):
         print(odoo_repr(obj), **kwargs)
+        return
+    reprs = records.iter_record_reprs(obj)
+    if pager is None:
+        pager = bool(config.pager) and "file" not in kwargs and sys.stdout.isatty()
+    if pager and util.page(reprs):
+        return
+    first = True
+    for rep in reprs:
+        if not first:
+            print()
+        first = False
+        print(rep, **kwargs)
 
 
 def _edit(fname, lnum=None, bg=None):
@@ -281,15 +303,49 @@ def edit(thing, index=0, bg=None):
 
 def displayhook(obj):
     # type: (object) -> None
-    """A sys.displayhook replacement that pretty-prints models and records."""
-    if obj is not None:
-        rep = odoo_repr(obj)
-        if not PY3 and isinstance(sys.stdout, StringIO):
-            # Printing unicode causes issues in Pyrasite
-            rep = rep.replace(u"×", "x")
-            rep = rep.encode("ascii", errors="backslashreplace")
-        print(rep)
-        builtins._ = obj  # type: ignore
+    """A sys.displayhook replacement that pretty-prints models and records.
+
+    Records are printed line by line as they're rendered. Ctrl-C stops the
+    rendering and cancels the running query, if any.
+    """
+    if obj is None:
+        return
+    _record_use(obj)
+    if util.is_record(obj):
+        env_ = obj.env  # type: t.Optional[odoo.api.Environment]
+    elif isinstance(obj, models.ModelProxy):
+        env_ = obj._env
+    else:
+        # Nothing to cancel, so don't bother with a savepoint
+        env_ = None
+    try:
+        with util.interruptible(env_):
+            for rep in _odoo_repr_lines(obj):
+                if not PY3 and isinstance(sys.stdout, StringIO):
+                    # Printing unicode causes issues in Pyrasite
+                    rep = rep.replace(u"×", "x")
+                    rep = rep.encode("ascii", errors="backslashreplace")
+                print(rep)
+                if util.query_interrupted:
+                    break
+    except KeyboardInterrupt:
+        print(color.missing("Interrupted"))
+    builtins._ = obj  # type: ignore
+
+
+def _record_use(obj):
+    # type: (object) -> None
+    if util.is_record(obj):
+        warmup.record_use(obj._name)  # type: ignore
+    elif isinstance(obj, models.ModelProxy) and obj._real is not None:
+        warmup.record_use(obj._path)
+
+
+def _odoo_repr_lines(obj):
+    # type: (object) -> t.Iterable[t.Text]
+    if util.is_record(obj):
+        return records.iter_record_lines(obj)  # type: ignore
+    return [odoo_repr(obj)]
 
 
 class EnvProxy(object):
@@ -3,6 +3,7 @@
 
 from __future__ import unicode_literals
 
+import contextlib
 import textwrap
 
 from datetime import datetime, date
@@ -10,7 +11,7 @@ from datetime import datetime, date
 from odoo_repl import config
 from odoo_repl import shorthand
 from odoo_repl import util
-from odoo_repl.imports import odoo, t, TextLike, Field, BaseModel, cast
+from odoo_repl.imports import odoo, t, MYPY, TextLike, Field, BaseModel, cast
 
 
 class Color:
@@ -112,24 +113,92 @@ def render_employee(obj, link=True):
 
 def make_affix(obj):
     # type: (BaseModel) -> t.Optional[t.Text]
-    affix = None
+    if _affixes is not None and (obj._name, obj.id) in _affixes:
+        return _affixes[obj._name, obj.id]
     xml_ids = util.xml_ids(obj)
     if xml_ids:
         return xml_ids[0].to_ref()
     try:
-        name = obj.display_name
-        default_name = "{},{}".format(obj._name, obj.id)
-        if name and name != default_name:
-            affix = repr(name)
-            if affix.startswith("u"):
-                # Unicode string literal, distracting
-                affix = affix[1:]
-            return affix
+        return _name_affix(obj)
     except Exception:
-        pass
+        return None
+
+
+def _name_affix(obj):
+    # type: (BaseModel) -> t.Optional[t.Text]
+    name = obj.display_name
+    default_name = "{},{}".format(obj._name, obj.id)
+    if name and name != default_name:
+        affix = repr(name)
+        if affix.startswith("u"):
+            # Unicode string literal, distracting
+            affix = affix[1:]
+        return affix
     return None
 
 
+if MYPY:
+    _AffixMap = t.Dict[t.Tuple[t.Text, object], t.Optional[t.Text]]
+
+# (model name, id) -> affix, while batched_affixes() is active
+_affixes = None  # type: t.Optional[_AffixMap]
+
+
+@contextlib.contextmanager
+def batched_affixes(recordsets):
+    # type: (t.Iterable[BaseModel]) -> t.Iterator[None]
+    """Look up the affixes of single records in bulk for make_affix to use.
+
+    XML ids are resolved in one go, and display names with one batch per
+    model.
+    """
+    global _affixes
+    if _affixes is not None:
+        # Already inside another batch
+        yield
+        return
+    _affixes = _compute_affixes(recordsets)
+    try:
+        yield
+    finally:
+        _affixes = None
+
+
+def _compute_affixes(recordsets):
+    # type: (t.Iterable[BaseModel]) -> _AffixMap
+    by_model = {}  # type: t.Dict[t.Text, BaseModel]
+    for obj in recordsets:
+        if len(obj._ids) != 1 or isinstance(obj.id, odoo.models.NewId):
+            continue
+        if obj._name in by_model:
+            by_model[obj._name] |= obj
+        else:
+            by_model[obj._name] = obj
+    if not by_model:
+        return {}
+    env = next(iter(by_model.values())).env
+    xml_ids = util.bulk_xml_ids(
+        env, [(model_name, objs._ids) for model_name, objs in by_model.items()]
+    )
+    affixes = {}  # type: _AffixMap
+    for model_name, objs in by_model.items():
+        unnamed = []
+        for ident in objs._ids:
+            if (model_name, ident) in xml_ids:
+                affixes[model_name, ident] = xml_ids[model_name, ident][0].to_ref()
+            else:
+                unnamed.append(ident)
+        try:
+            # Iterating over a single recordset lets display_name be
+            # computed in one batch
+            for obj in objs.browse(unnamed):
+                affixes[model_name, obj.id] = _name_affix(obj)
+        except Exception:
+            # make_affix will deal with these one by one
+            pass
+    return affixes
+
+
 def basic_render_record(obj, link=True):
     # type: (BaseModel, bool) -> t.Text
     """Build a model[id] style record representation.
@@ -9,6 +9,8 @@ import os
 color = not (os.environ.get("NO_COLOR") or os.environ.get("ODOO_REPL_NO_COLOR"))
 
 editor = tuple((os.environ.get("EDITOR") or "nano").split())
+# Used by .print_() for more than one record, set to () to never page
+pager = tuple((os.environ.get("PAGER") or "less").split())
 bg_editor = bool(os.environ.get("ODOO_REPL_BG_EDITOR"))
 
 # Clickable filenames could interfere with linkification that includes line numbers,
@@ -21,3 +23,39 @@ grep = os.environ.get("ODOO_REPL_GREP", "")
 force_pdb = bool(os.environ.get("ODOO_REPL_FORCE_PDB"))
 
 slow_tests = bool(os.environ.get("ODOO_REPL_SLOW_TESTS"))
+
+cache_dir = os.path.join(
+    os.environ.get("XDG_CACHE_HOME") or os.path.expanduser("~/.cache"), "odoo-repl"
+)
+
+# Set to an empty string to always parse XML data files from scratch
+xml_cache = os.environ.get(
+    "ODOO_REPL_XML_CACHE", os.path.join(cache_dir, "xml_records.pickle")
+)
+
+# Number of processes to parse XML data files with, 0 means one per CPU
+xml_processes = int(os.environ.get("ODOO_REPL_XML_PROCESSES") or 0)
+
+# Seconds between checks for changed XML data files, 0 to only check on access
+xml_watch = float(os.environ.get("ODOO_REPL_XML_WATCH") or 0)
+
+# Models to cache source information for in the background after startup,
+# comma-separated. "auto" means the ones used most in earlier sessions.
+warmup = [
+    name.strip()
+    for name in os.environ.get("ODOO_REPL_WARMUP", "").split(",")
+    if name.strip()
+]
+
+# Maximum number of records to remember the XML ids of, 0 to always query
+xml_id_cache_size = int(os.environ.get("ODOO_REPL_XML_ID_CACHE_SIZE") or 10000)
+
+# Number of records to load at a time when working through many of them:
+# printing, tables, iterating over a model and exporting
+chunk_size = int(os.environ.get("ODOO_REPL_CHUNK_SIZE") or 1000)
+
+# Fields that took longer than this many seconds are skipped when showing
+# records, until .force_() shows them to be faster. 0 means no limit
+field_budget = float(os.environ.get("ODOO_REPL_FIELD_BUDGET") or 2)
+# After this many seconds, fields of a record that aren't loaded yet are skipped
+record_budget = float(os.environ.get("ODOO_REPL_RECORD_BUDGET") or 10)
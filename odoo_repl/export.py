@@ -0,0 +1,387 @@
+"""Write records to files for analysis elsewhere.
+
+Rows are fetched a chunk at a time (config.chunk_size) and written
+out before the next chunk is fetched, so memory use doesn't depend on the
+number of records. Plain stored columns and many2one columns come straight
+from SQL, other fields are read through the ORM one chunk at a time.
+
+CSV and JSON Lines are always available, Parquet and Arrow need pyarrow.
+"""
+
+from __future__ import unicode_literals
+
+import csv
+import datetime
+import io
+import itertools
+import json
+import os
+
+from odoo_repl import config
+from odoo_repl import util
+from odoo_repl.imports import PY3, t, MYPY, BaseModel, Field, Text, odoo
+
+if MYPY:
+    _Row = t.Dict[t.Text, t.Any]
+    _SqlChunks = t.Iterator[t.List[t.Tuple[t.Any, ...]]]
+    _Chunks = t.Iterable[t.List[t.List[t.Any]]]
+    _NameMap = t.Dict[t.Text, t.Dict[int, t.Text]]
+
+FORMATS = {
+    ".csv": "csv",
+    ".jsonl": "jsonl",
+    ".ndjson": "jsonl",
+    ".parquet": "parquet",
+    ".arrow": "arrow",
+    ".feather": "arrow",
+}
+
+_cursor_count = itertools.count()
+
+
+@util.patch(BaseModel)
+def export_(
+    record,  # type: BaseModel
+    path,  # type: t.Text
+    fields=None,  # type: t.Optional[t.Sequence[t.Text]]
+    format=None,  # type: t.Optional[t.Text]
+    many2one="id",  # type: t.Text
+):
+    # type: (...) -> int
+    """Write the records to a file and return the number of rows written.
+
+    fields defaults to all stored fields except one2many and many2many
+    fields. The format is guessed from the file extension if not given, it
+    can be "csv", "jsonl", "parquet" or "arrow". Many2one fields are written
+    as ids, or as display names with many2one="name".
+    """
+    record = util.unwrap(record)
+    ids = [ident for ident in record._ids if not isinstance(ident, odoo.models.NewId)]
+    return export(record, path, fields, format, many2one, ids=ids)
+
+
+def export(
+    model,  # type: BaseModel
+    path,  # type: t.Text
+    fields=None,  # type: t.Optional[t.Sequence[t.Text]]
+    format=None,  # type: t.Optional[t.Text]
+    many2one="id",  # type: t.Text
+    ids=None,  # type: t.Optional[t.List[int]]
+):
+    # type: (...) -> int
+    """Export records of a model, or all rows of its table if ids is None."""
+    if format is None:
+        ext = os.path.splitext(path)[1].lower()
+        if ext not in FORMATS:
+            raise ValueError(
+                "Can't guess the format of {!r}, pass format= explicitly".format(path)
+            )
+        format = FORMATS[ext]
+    if format not in _WRITERS:
+        raise ValueError("Unknown format {!r}".format(format))
+    if many2one not in {"id", "name"}:
+        raise ValueError("many2one should be 'id' or 'name'")
+    if format in {"parquet", "arrow"}:
+        try:
+            import pyarrow  # noqa: F401
+        except ImportError:
+            raise ImportError("Exporting to {} needs pyarrow".format(format))
+    # Models with _auto = False are often reports backed by a view, which
+    # can be exported like a table
+    if model._abstract or not _has_relation(model):
+        raise TypeError("Model {!r} has no table or view".format(model._name))
+    if fields is None:
+        fields = [
+            name
+            for name, field in sorted(model._fields.items())
+            if field.store and field.type not in {"one2many", "many2many"}
+        ]
+    names = ["id"] + [name for name in fields if name != "id"]
+    for name in names:
+        if name not in model._fields:
+            raise ValueError("Field {!r} doesn't exist".format(name))
+    field_objs = [model._fields[name] for name in names]
+    chunks = (
+        _convert_chunk(model, rows, field_objs, many2one)
+        for rows in _chunks(model, field_objs, ids)
+    )
+    return _WRITERS[format](path, field_objs, chunks, many2one)
+
+
+def _has_relation(model):
+    # type: (BaseModel) -> bool
+    if not getattr(model, "_table", None):
+        return False
+    return bool(
+        util.sql(model.env, "SELECT 1 FROM pg_class WHERE relname = %s", model._table)
+    )
+
+
+def _chunks(
+    model,  # type: BaseModel
+    fields,  # type: t.List[Field]
+    ids,  # type: t.Optional[t.List[int]]
+):
+    # type: (...) -> t.Iterator[t.List[_Row]]
+    sql_names = [field.name for field in fields if util.is_plain_column(field)]
+    if "id" not in sql_names:
+        sql_names.insert(0, "id")
+    orm_names = [field.name for field in fields if field.name not in sql_names]
+    size = max(config.chunk_size, 1)
+    util.flush(model.env)
+    if ids is None:
+        row_chunks = _stream_table(model, sql_names, size)
+    else:
+        row_chunks = _query_ids(model, sql_names, ids, size)
+    for rows in row_chunks:
+        values = [dict(zip(sql_names, row)) for row in rows]
+        if orm_names:
+            by_id = {row["id"]: row for row in values}
+            chunk = model.browse(list(by_id))
+            for row in chunk.read(orm_names):
+                by_id[row["id"]].update(row)
+            # Don't let the cache grow with every chunk
+            util.invalidate_cache(model.env)
+        yield values
+
+
+def _stream_table(model, names, size):
+    # type: (BaseModel, t.List[t.Text], int) -> _SqlChunks
+    """Fetch all rows of the table through a server-side cursor.
+
+    Archived rows are left out, like search() does.
+    """
+    query = 'SELECT {} FROM "{}"'.format(
+        ", ".join('"{}"'.format(name) for name in names), model._table
+    )
+    active = util.active_column(model)
+    if active:
+        query += ' WHERE "{}" = true'.format(active)
+    query += " ORDER BY id"
+    cursor_name = "odoo_repl_export_{}".format(next(_cursor_count))
+    cr = model.env.cr._cnx.cursor(cursor_name)
+    cr.itersize = size
+    try:
+        cr.execute(query)
+        while True:
+            rows = cr.fetchmany(size)
+            if not rows:
+                break
+            yield rows
+    finally:
+        cr.close()
+
+
+def _query_ids(model, names, ids, size):
+    # type: (BaseModel, t.List[t.Text], t.List[int], int) -> _SqlChunks
+    """Fetch rows for known ids, keeping the order of the records."""
+    query = 'SELECT {} FROM "{}" WHERE id IN %s'.format(
+        ", ".join('"{}"'.format(name) for name in names), model._table
+    )
+    for start in range(0, len(ids), size):
+        chunk_ids = ids[start : start + size]
+        by_id = {row[0]: row for row in util.sql(model.env, query, tuple(chunk_ids))}
+        yield [by_id[ident] for ident in chunk_ids if ident in by_id]
+
+
+def _convert_chunk(model, rows, fields, many2one):
+    # type: (BaseModel, t.List[_Row], t.List[Field], t.Text) -> t.List[t.List[t.Any]]
+    names = {}  # type: _NameMap
+    if many2one == "name":
+        names = _many2one_names(model, rows, fields)
+    return [
+        [
+            _convert(row.get(field.name), field, names.get(field.name))
+            for field in fields
+        ]
+        for row in rows
+    ]
+
+
+def _many2one_names(model, rows, fields):
+    # type: (BaseModel, t.List[_Row], t.List[Field]) -> _NameMap
+    """Look up display names of many2one values, with one batch per model."""
+    by_model = {}  # type: t.Dict[t.Text, t.Set[int]]
+    for field in fields:
+        if field.type != "many2one":
+            continue
+        ids = by_model.setdefault(field.comodel_name, set())
+        for row in rows:
+            value = row.get(field.name)
+            if isinstance(value, int) and not isinstance(value, bool):
+                ids.add(value)
+    names_by_model = {}  # type: t.Dict[t.Text, t.Dict[int, t.Text]]
+    for model_name, ids in by_model.items():
+        related = model.env[model_name].browse(sorted(ids)).exists()
+        names_by_model[model_name] = {rec.id: rec.display_name for rec in related}
+    return {
+        field.name: names_by_model[field.comodel_name]
+        for field in fields
+        if field.type == "many2one"
+    }
+
+
+def _convert(value, field, names=None):
+    # type: (t.Any, Field, t.Optional[t.Dict[int, t.Text]]) -> t.Any
+    """Turn a value from SQL or read() into a plain Python value.
+
+    Missing values become None. Many2one fields become ids, or names if
+    names is given, x2many fields become lists of ids.
+    """
+    if field.type == "boolean":
+        return bool(value)
+    if value is None or value is False:
+        return None
+    if field.type == "many2one":
+        if isinstance(value, (tuple, list)):
+            # As returned by read()
+            if names is None:
+                return value[0]
+            return value[1]
+        if names is not None:
+            return names.get(value)
+        return value
+    if field.type in {"one2many", "many2many"}:
+        return list(value)
+    if field.type == "date" and isinstance(value, Text):
+        return datetime.datetime.strptime(value[:10], "%Y-%m-%d").date()
+    if field.type == "datetime" and isinstance(value, Text):
+        return datetime.datetime.strptime(value[:19], "%Y-%m-%d %H:%M:%S")
+    if field.type in {
+        "integer",
+        "many2one_reference",
+        "float",
+        "monetary",
+        "date",
+        "datetime",
+    }:
+        return value
+    if isinstance(value, bytes):
+        return value.decode("utf-8", "replace")
+    if isinstance(value, (dict, list)):
+        return json.dumps(value, default=_json_default)
+    if not isinstance(value, Text):
+        return "{}".format(value)
+    return value
+
+
+def _json_default(value):
+    # type: (object) -> t.Any
+    if isinstance(value, (datetime.date, datetime.datetime)):
+        return value.isoformat()
+    if isinstance(value, bytes):
+        return value.decode("utf-8", "replace")
+    return "{}".format(value)
+
+
+def _write_csv(path, fields, chunks, _many2one):
+    # type: (t.Text, t.List[Field], _Chunks, t.Text) -> int
+    count = 0
+    if PY3:
+        f = io.open(path, "w", encoding="utf-8", newline="")
+    else:
+        f = open(path, "wb")
+    with f:
+        writer = csv.writer(f)
+        writer.writerow([_csv_cell(field.name) for field in fields])
+        for rows in chunks:
+            writer.writerows([[_csv_cell(value) for value in row] for row in rows])
+            count += len(rows)
+    return count
+
+
+def _csv_cell(value):
+    # type: (t.Any) -> t.Any
+    if value is None:
+        return ""
+    if isinstance(value, list):
+        value = ",".join("{}".format(ident) for ident in value)
+    elif isinstance(value, (datetime.date, datetime.datetime)):
+        value = value.isoformat()
+    if not PY3 and isinstance(value, Text):
+        return value.encode("utf-8")
+    return value
+
+
+def _write_jsonl(path, fields, chunks, _many2one):
+    # type: (t.Text, t.List[Field], _Chunks, t.Text) -> int
+    count = 0
+    names = [field.name for field in fields]
+    with open(path, "w") as f:
+        for rows in chunks:
+            f.write(
+                "".join(
+                    json.dumps(dict(zip(names, row)), default=_json_default) + "\n"
+                    for row in rows
+                )
+            )
+            count += len(rows)
+    return count
+
+
+def _arrow_schema(fields, many2one):
+    # type: (t.List[Field], t.Text) -> t.Any
+    import pyarrow
+
+    types = {
+        "integer": pyarrow.int64(),
+        "many2one_reference": pyarrow.int64(),
+        "float": pyarrow.float64(),
+        "monetary": pyarrow.float64(),
+        "boolean": pyarrow.bool_(),
+        "date": pyarrow.date32(),
+        "datetime": pyarrow.timestamp("s"),
+        "one2many": pyarrow.list_(pyarrow.int64()),
+        "many2many": pyarrow.list_(pyarrow.int64()),
+        "many2one": pyarrow.int64() if many2one == "id" else pyarrow.string(),
+    }
+    return pyarrow.schema(
+        [(field.name, types.get(field.type, pyarrow.string())) for field in fields]
+    )
+
+
+def _write_arrow_batches(writer, schema, chunks):
+    # type: (t.Any, t.Any, _Chunks) -> int
+    import pyarrow
+
+    count = 0
+    for rows in chunks:
+        columns = [
+            pyarrow.array([row[ind] for row in rows], type=column.type)
+            for ind, column in enumerate(schema)
+        ]
+        writer.write_table(pyarrow.Table.from_arrays(columns, schema=schema))
+        count += len(rows)
+    return count
+
+
+def _write_parquet(path, fields, chunks, many2one):
+    # type: (t.Text, t.List[Field], _Chunks, t.Text) -> int
+    import pyarrow.parquet
+
+    schema = _arrow_schema(fields, many2one)
+    writer = pyarrow.parquet.ParquetWriter(path, schema)
+    try:
+        return _write_arrow_batches(writer, schema, chunks)
+    finally:
+        writer.close()
+
+
+def _write_arrow(path, fields, chunks, many2one):
+    # type: (t.Text, t.List[Field], _Chunks, t.Text) -> int
+    import pyarrow.ipc
+
+    schema = _arrow_schema(fields, many2one)
+    writer = pyarrow.ipc.new_file(path, schema)
+    try:
+        return _write_arrow_batches(writer, schema, chunks)
+    finally:
+        writer.close()
+
+
+_WRITERS = {
+    "csv": _write_csv,
+    "jsonl": _write_jsonl,
+    "parquet": _write_parquet,
+    "arrow": _write_arrow,
+}
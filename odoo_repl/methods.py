@@ -60,20 +60,16 @@ class MethodProxy(object):
     def source_(self, location=None):
         # type: (t.Optional[t.Text]) -> None
         first = True
-        for cls in type(self.model).__mro__[1:]:
-            module = util.module(cls)
-            if location is not None and location != module:
+        for link in sources.method_chain(self.model, self.name):
+            if location is not None and location != link.module:
                 continue
-            if self.name in vars(cls):
-                func = util.unpack_function(vars(cls)[self.name])
-                fname = sources.getsourcefile(func)
-                lines, lnum = inspect.getsourcelines(func)
-                if not first:
-                    print()
-                else:
-                    first = False
-                print(sources.format_source(sources.Source(module, fname, lnum)))
-                print(color.highlight("".join(lines)))
+            lines, _ = inspect.getsourcelines(link.func)
+            if not first:
+                print()
+            else:
+                first = False
+            print(sources.format_source(link.to_source()))
+            print(color.highlight("".join(lines)))
 
     gitsource_ = gitsources.gitsource
 
@@ -87,27 +83,25 @@ class MethodProxy(object):
         your fault.
         """
         argv = grep.build_grep_argv(args, kwargs)
-        for cls in type(self.model).__mro__[1:]:
-            if self.name in vars(cls):
-                func = util.unpack_function(vars(cls)[self.name])
-                try:
-                    grep.partial_grep(argv, func)
-                except grep.BadCommandline as err:
-                    print(err, file=sys.stderr)
-                    return
-                except grep.NoResults:
-                    continue
-                else:
-                    print()
+        for link in sources.method_chain(self.model, self.name):
+            try:
+                grep.partial_grep(argv, link.func)
+            except grep.BadCommandline as err:
+                print(err, file=sys.stderr)
+                return
+            except grep.NoResults:
+                continue
+            else:
+                print()
 
 
 def _get_method_docs(model, name):
     # type: (BaseModel, str) -> t.Iterable[t.Tuple[str, t.Text]]
-    return sources.find_docs(
-        (util.module(cls), vars(cls)[name])
-        for cls in type(model).__mro__
-        if name in vars(cls)
-    )
+    docs = [(link.module, link.attr) for link in sources.method_chain(model, name)]
+    model_cls = type(model)
+    if name in vars(model_cls):
+        docs.insert(0, (util.module(model_cls), vars(model_cls)[name]))
+    return sources.find_docs(docs)
 
 
 def method_repr(methodproxy, ignore_modules=()):
@@ -9,12 +9,14 @@ import odoo_repl
 
 from odoo_repl import access
 from odoo_repl import color
+from odoo_repl import export
 from odoo_repl import fields
 from odoo_repl import grep
 from odoo_repl import methods
 from odoo_repl import search
 from odoo_repl import sources
 from odoo_repl import util
+from odoo_repl import warmup
 from odoo_repl.imports import abc, odoo, t, cast, Field, PY3, Text, BaseModel
 
 
@@ -191,6 +193,20 @@ def _find_inheritance(model):
     return inherits - {model._name, "base"}
 
 
+# Below this many rows an exact count is fast enough
+APPROX_COUNT_MIN = 10000
+
+
+class ApproxCount(int):
+    """An estimated number of records."""
+
+    def __repr__(self):
+        # type: () -> str
+        return "~{}".format(int(self))
+
+    __str__ = __repr__
+
+
 class ModelProxy(object):
     """A wrapper around an Odoo model.
 
@@ -251,6 +267,10 @@ class ModelProxy(object):
             "filtered_",
             "_all_ids_",
             "fields_",
+            "table_",
+            "export_",
+            "count_",
+            "page_",
         }  # type: t.Set[t.Text]
         if PY3:
             listing = set(super().__dir__())
@@ -277,7 +297,7 @@ class ModelProxy(object):
     def __iter__(self):
         # type: () -> t.Iterator[BaseModel]
         assert self._real is not None
-        return iter(self._real.search([], order="id asc"))
+        return util.iter_records(self._real)
 
     @property
     def fields_(self):
@@ -290,18 +310,58 @@ class ModelProxy(object):
 
     def __len__(self):
         # type: () -> int
+        return self.count_()
+
+    def count_(self, approx=False):
+        # type: (bool) -> int
+        """Count the records, or estimate the count with approx=True.
+
+        The estimate comes from the query planner and takes milliseconds
+        even on huge tables, but ignores record rules. It's only used if
+        there are at least APPROX_COUNT_MIN rows, and it's shown with a ~
+        in front. len() always counts exactly, since an int can't carry the ~.
+        """
         assert self._real is not None
+        if approx and self._real._auto:
+            estimate = util.estimate_count(self._real)
+            if estimate >= APPROX_COUNT_MIN:
+                return ApproxCount(estimate)
         return self._real.search([], count=True)
 
     def mapped(self, *a, **k):
         # type: (t.Any, t.Any) -> t.Any
-        assert self._real is not None
-        return self._real.search([]).mapped(*a, **k)
+        """Like .search([]).mapped(), but without loading all records if possible.
 
-    def filtered(self, *a, **k):
-        # type: (t.Any, t.Any) -> BaseModel
+        A path that starts with a stored column is looked up with SQL. Other
+        paths and functions are evaluated on one chunk of records at a time.
+        Either way values are in order of id, not in the model's _order.
+        """
+        assert self._real is not None
+        if len(a) == 1 and not k and isinstance(a[0], Text):
+            result = _mapped_sql(self._real, a[0])
+            if result is not None:
+                return result
+        results = [chunk.mapped(*a, **k) for chunk in util.iter_chunks(self._real)]
+        if not results:
+            return self._real.browse().mapped(*a, **k)
+        if isinstance(results[0], BaseModel):
+            return results[0].union(*results[1:])
+        return [value for result in results for value in result]
+
+    def filtered(self, func):
+        # type: (t.Any) -> BaseModel
+        """Like .search([]).filtered(), but with a domain if possible.
+
+        A path of stored boolean or relational fields becomes a search,
+        anything else is evaluated on one chunk of records at a time. Either
+        way the result is in order of id, not in the model's _order.
+        """
         assert self._real is not None
-        return self._real.search([]).filtered(*a, **k)
+        if isinstance(func, Text):
+            domain = search.truthy_domain(self._real, func)
+            if domain is not None:
+                return self._real.search(domain, order="id")
+        return self._filter_chunks([], lambda chunk: chunk.filtered(func))
 
     def get_xml_id(self):
         # type: () -> t.Dict[int, t.Text]
@@ -313,10 +373,31 @@ class ModelProxy(object):
             )
         }
 
-    def filtered_(self, *a, **k):
+    def filtered_(self, func=None, **field_vals):
         # type: (t.Any, t.Any) -> BaseModel
+        """Like .search([]).filtered_(), but with a domain if possible.
+
+        Keyword filters on stored fields become a search, and a function is
+        then only called on the records that match them. The result is in
+        order of id, not in the model's _order.
+        """
+        assert self._real is not None
+        domain = search.stored_domain(self._real, field_vals)
+        if domain is None:
+            return self._filter_chunks(
+                [], lambda chunk: chunk.filtered_(func, **field_vals)
+            )
+        if func is None:
+            return self._real.search(domain, order="id")
+        return self._filter_chunks(domain, lambda chunk: chunk.filtered(func))
+
+    def _filter_chunks(self, domain, filter_chunk):
+        # type: (t.List[t.Any], t.Callable[[BaseModel], BaseModel]) -> BaseModel
         assert self._real is not None
-        return self._real.search([]).filtered_(*a, **k)  # type: ignore
+        ids = []  # type: t.List[int]
+        for chunk in util.iter_chunks(self._real, domain):
+            ids.extend(filter_chunk(chunk)._ids)
+        return self._real.browse(ids)
 
     def __repr__(self):
         # type: () -> str
@@ -325,6 +406,7 @@ class ModelProxy(object):
     def _repr_pretty_(self, printer, _cycle):
         # type: (t.Any, t.Any) -> None
         if self._real is not None and printer.indentation == 0:
+            warmup.record_use(self._path)
             printer.text(model_repr(self._real))
         else:
             printer.text(repr(self))
@@ -336,14 +418,10 @@ class ModelProxy(object):
         if not ind:
             return self._real
         ignore_missing = False
-        if isinstance(ind, slice) or isinstance(ind, int) and ind < 0:
-            max_id = util.sql(
-                self._env,
-                'SELECT id FROM "{}" ORDER BY id DESC LIMIT 1'.format(
-                    self._real._table
-                ),
-            )[0]
-            ind = range(max_id + 1)[ind]
+        if isinstance(ind, slice):
+            return self._real.browse(self._slice_ids(ind))
+        if isinstance(ind, int) and ind < 0:
+            ind = range(self._max_id() + 1)[ind]
             ignore_missing = True
         if isinstance(ind, Text):
             if ind in self._real._fields:
@@ -376,6 +454,57 @@ class ModelProxy(object):
                 )
         return self._real.browse(ind)
 
+    def _max_id(self):
+        # type: () -> int
+        assert self._real is not None
+        ids = util.sql(
+            self._env,
+            'SELECT id FROM "{}" ORDER BY id DESC LIMIT 1'.format(self._real._table),
+        )
+        return ids[0] if ids else 0
+
+    def _slice_ids(self, ind):
+        # type: (slice) -> t.List[int]
+        """Find the ids in range(max_id + 1)[ind] that exist.
+
+        This is a range query on the primary key, so its cost depends on the
+        number of records found rather than on the width of the range.
+        """
+        assert self._real is not None
+        start, stop, step = ind.indices(self._max_id() + 1)
+        if step > 0:
+            conditions = ["id >= %s", "id < %s"]
+            order = "ASC"
+        else:
+            conditions = ["id <= %s", "id > %s"]
+            order = "DESC"
+        args = [start, stop]  # type: t.List[int]
+        if abs(step) != 1:
+            conditions.append("abs(id - %s) %% %s = 0")
+            args.extend([start, abs(step)])
+        return util.sql(
+            self._env,
+            'SELECT id FROM "{}" WHERE {} ORDER BY id {}'.format(
+                self._real._table, " AND ".join(conditions), order
+            ),
+            *args
+        )
+
+    def page_(self, after=0, size=80, domain=()):
+        # type: (t.Union[BaseModel, int], int, t.Iterable[t.Any]) -> BaseModel
+        """Get the next size records with an id higher than after.
+
+        after can also be a previous page, so that res.partner.page_(page)
+        continues where page left off. Each page is a search on the primary
+        key, so it's just as fast at the end of a huge table as at the start.
+        """
+        assert self._real is not None
+        if isinstance(after, BaseModel):
+            after = max(after._ids) if after else 0
+        return self._real.search(
+            list(domain) + [("id", ">", after)], order="id", limit=size
+        )
+
     def _ipython_key_completions_(self):
         # type: () -> t.List[t.Text]
         assert self._real is not None
@@ -649,6 +778,29 @@ class ModelProxy(object):
         """Print all records. Shortcut for `._().print_()`."""
         odoo_repl.odoo_print(self._(), **kwargs)
 
+    def table_(self, *field_names, **kwargs):
+        # type: (t.Text, t.Any) -> None
+        """Print fields of all records as a table. Shortcut for `._().table_()`."""
+        self._ensure_real()
+        self._().table_(*field_names, **kwargs)
+
+    def export_(
+        self,
+        path,  # type: t.Text
+        fields=None,  # type: t.Optional[t.Sequence[t.Text]]
+        format=None,  # type: t.Optional[t.Text]
+        many2one="id",  # type: t.Text
+    ):
+        # type: (...) -> int
+        """Write all records to a file, see BaseModel.export_.
+
+        This reads the table (or the view, for reports like sale.report)
+        directly, so record rules don't apply. Archived
+        records are left out unless active_test is disabled in the context.
+        """
+        self._ensure_real()
+        return export.export(self._env[self._path], path, fields, format, many2one)
+
     def _(self, *args, **kwargs):
         # type: (t.Any, t.Any) -> t.Any
         """Perform a quick and dirty search.
@@ -664,6 +816,96 @@ class ModelProxy(object):
         return search.search(self._real, args, kwargs)
 
 
+def _mapped_sql(model, path):
+    # type: (BaseModel, t.Text) -> t.Any
+    """Do .search([]).mapped(path) with SQL, or return None if that's unsafe.
+
+    Only the first field of the path is looked up this way, the rest is
+    mapped on the (distinct) related records.
+    """
+    if not model._auto:
+        return None
+    name, _, rest = path.partition(".")
+    field = model._fields.get(name)
+    if (
+        field is None
+        or not util.is_plain_column(field)
+        or (rest and field.type != "many2one")
+    ):
+        return None
+    util.flush(model.env)
+    where = _search_condition(model)
+    if where is None:
+        return None
+    condition, params = where
+    if field.type == "many2one":
+        ids = util.sql(
+            model.env,
+            'SELECT "{0}" FROM "{1}" WHERE {2} AND "{0}" IS NOT NULL '
+            'GROUP BY "{0}" ORDER BY MIN(id)'.format(name, model._table, condition),
+            *params
+        )
+        related = model.env[field.comodel_name].browse(ids)
+        return related.mapped(rest) if rest else related
+    values = util.sql(
+        model.env,
+        'SELECT "{}" FROM "{}" WHERE {} ORDER BY id'.format(
+            name, model._table, condition
+        ),
+        *params
+    )
+    return [_column_value(value, field) for value in values]
+
+
+def _search_condition(model):
+    # type: (BaseModel) -> t.Optional[t.Tuple[t.Text, t.List[t.Any]]]
+    """A condition on the model's table that matches the rows of search([]).
+
+    Since Odoo 14 _search() builds a query without running it, so record
+    rules, the active filter and overrides of _search() all apply. Older
+    versions run the search, so then only the active filter is added, and
+    only if nothing else could change the result.
+    """
+    if odoo.release.version_info >= (14, 0):
+        query = model._search([])
+        if not hasattr(query, "subselect"):
+            # An override returned ids it filtered itself
+            return None
+        subquery = query.subselect()
+        if isinstance(subquery, tuple):
+            code, params = subquery
+        else:
+            # Odoo 17 returns an SQL object
+            code, params = subquery.code, subquery.params
+        return '"{}".id IN ({})'.format(model._table, code), list(params)
+    if not util.bypasses_rules(model.env) or _overrides_search(model):
+        return None
+    active = util.active_column(model)
+    if active:
+        return '"{}" = true'.format(active), []
+    return "true", []
+
+
+def _overrides_search(model):
+    # type: (BaseModel) -> bool
+    method = type(model)._search
+    base_method = BaseModel._search
+    return getattr(method, "__func__", method) is not getattr(
+        base_method, "__func__", base_method
+    )
+
+
+def _column_value(value, field):
+    # type: (t.Any, Field) -> t.Any
+    """Convert a column value to the value the field has on a record."""
+    if value is None:
+        return {"integer": 0, "float": 0.0, "monetary": 0.0}.get(field.type, False)
+    if field.type in {"date", "datetime"} and odoo.release.version_info < (12, 0):
+        # Older versions represent dates as strings
+        return field.to_string(value)
+    return value
+
+
 def _to_user(
     env,  # type: odoo.api.Environment
     user,  # type: t.Union[BaseModel, t.Text, int]
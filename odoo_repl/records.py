@@ -1,49 +1,62 @@
+# -*- coding: utf-8 -*-
 from __future__ import print_function
 
 import random
 import sys
+import time
 
 import odoo_repl
-from odoo_repl.imports import t, BaseModel, TextLike, odoo
+from odoo_repl.imports import t, MYPY, BaseModel, Text, TextLike, odoo
 from odoo_repl import color
+from odoo_repl import config
 from odoo_repl import grep
+from odoo_repl import search
 from odoo_repl import sources
 from odoo_repl import util
+from odoo_repl import warmup
 
 
-def record_repr(obj):
-    # type: (BaseModel) -> t.Text
-    """Display all of a record's fields."""
+def record_repr(obj, load_fields=True):
+    # type: (BaseModel, bool) -> t.Text
+    """Display all of a record's fields.
+
+    With load_fields=False, stored fields are assumed to be in the cache
+    already, see iter_record_reprs.
+    """
+    return "\n".join(iter_record_lines(obj, load_fields=load_fields))
+
+
+def iter_record_lines(obj, load_fields=True):
+    # type: (BaseModel, bool) -> t.Iterator[t.Text]
+    """Render a record line by line, so that lines can be shown right away."""
     obj = util.unwrap(obj)
 
     if not hasattr(obj, "_ids"):
-        return repr(obj)
+        yield repr(obj)
+        return
     elif not obj:
-        return u"{}[]".format(obj._name)
+        yield u"{}[]".format(obj._name)
+        return
     elif len(obj) > 1:
-        return color.basic_render_record(obj)
+        yield color.basic_render_record(obj)
+        return
 
     if obj.env.cr.closed:
-        return color.basic_render_record(obj) + " (closed cursor)"
+        yield color.basic_render_record(obj) + " (closed cursor)"
+        return
 
-    field_names = sorted(
-        field
-        for field in obj._fields
-        if field not in odoo_repl.models.FIELD_BLACKLIST
-        and not obj._fields[field].related
-    )
+    field_names = _displayed_fields(obj)
     max_len = max(len(f) for f in field_names) if field_names else 0
-    parts = []
 
-    parts.append(color.record_header(obj))
+    yield color.record_header(obj)
     name = obj.sudo().display_name
     default_name = "{},{}".format(obj._name, obj.id)
     if name and name != default_name:
-        parts.append(color.display_name(name))
+        yield color.display_name(name)
 
     if not obj.exists():
-        parts.append(color.missing("Missing"))
-        return "\n".join(parts)
+        yield color.missing("Missing")
+        return
 
     # Odoo precomputes a field for up to 200 records at a time.
     # This can be a problem if we're only interested in one of them.
@@ -52,51 +65,221 @@ def record_repr(obj):
     # For Odoo 8, we do everything in a separate env where the ID cache is
     # empty. We make a separate env by changing the context. This has the added
     # advantage of informing models that they're running in odoo_repl, in case
-    # they care. In _color_repr we clear the cache in case it got filled.
+    # they care. In _field_value we clear the cache in case it got filled.
 
     # For Odoo 10-13, we slice the record. Odoo tries to be smart and narrows
     # the prefetch cache if we slice while keeping it when iterating.
 
     # I don't know what Odoo 9 does but I hope it's one of the above.
 
-    # TODO: When .print_()ing a recordset we do want prefetching.
+    # When .print_()ing a recordset we do want prefetching, so
+    # iter_record_reprs loads the stored fields for a chunk at a time.
 
     if isinstance(obj.id, odoo.models.NewId):
         # Cache gets wonky if we start a new environment
         no_prefetch_obj = obj
     else:
         no_prefetch_obj = obj.with_context(odoo_repl=True)[:]
-
-    for field in field_names:
-        parts.append(
-            "{}: ".format(color.field(field))
-            + (max_len - len(field)) * " "
-            + _color_repr(no_prefetch_obj, field)
-        )
+        if load_fields:
+            _load_stored_fields(no_prefetch_obj, field_names)
+
+    # Stored relational fields are cheap, so they're fetched up front to look
+    # up the records' affixes in bulk. The other fields are fetched and shown
+    # one at a time.
+    start = time.time()
+    skipped = []  # type: t.List[t.Text]
+    early = [
+        field
+        for field in field_names
+        if obj._fields[field].store and obj._fields[field].relational
+    ]
+    values = dict(
+        zip(early, _field_values(no_prefetch_obj, early, start=start, skipped=skipped))
+    )
+    rest = _field_values(
+        no_prefetch_obj,
+        [field for field in field_names if field not in values],
+        start=start,
+        skipped=skipped,
+    )
+    with color.batched_affixes(
+        value for value, _ in values.values() if isinstance(value, BaseModel)
+    ):
+        for field in field_names:
+            value, error = values[field] if field in values else next(rest)
+            yield (
+                "{}: ".format(color.field(field))
+                + (max_len - len(field)) * " "
+                + _color_repr(no_prefetch_obj, field, value, error)
+            )
+    if skipped:
+        skipped_fields[obj._name, obj.id] = skipped
+    else:
+        skipped_fields.pop((obj._name, obj.id), None)
 
     history_lines = _get_create_write_history(obj.sudo())
     if history_lines:
-        parts.append("")
-        parts.extend(history_lines)
+        yield ""
+        for line in history_lines:
+            yield line
 
     src = sources.find_source(obj)
     if src:
-        parts.append("")
-        parts.extend(sources.format_sources(src))
+        yield ""
+        for line in sources.format_sources(src):
+            yield line
 
-    return "\n".join(parts)
 
+def iter_record_reprs(obj):
+    # type: (BaseModel) -> t.Iterator[t.Text]
+    """Render records one by one, loading their fields in chunks.
 
-def _color_repr(owner, field_name):
-    # type: (BaseModel, t.Text) -> t.Text
-    """Return a color-coded representation of a record's field value."""
+    Nothing is fetched for records that are never asked for, so this can be
+    stopped partway through a huge recordset.
+    """
+    obj = util.unwrap(obj)
+    field_names = _displayed_fields(obj)
+    size = max(config.chunk_size, 1)
+    for start in range(0, len(obj), size):
+        chunk = obj[start : start + size]
+        _load_stored_fields(
+            chunk.with_context(odoo_repl=True).filtered(
+                lambda record: not isinstance(record.id, odoo.models.NewId)
+            ),
+            field_names,
+        )
+        for record in chunk:
+            yield record_repr(record, load_fields=False)
+
+
+def _displayed_fields(obj):
+    # type: (BaseModel) -> t.List[t.Text]
+    return sorted(
+        field
+        for field in obj._fields
+        if field not in odoo_repl.models.FIELD_BLACKLIST
+        and not obj._fields[field].related
+    )
+
+
+def _load_stored_fields(record, field_names):
+    # type: (BaseModel, t.List[t.Text]) -> None
+    """Load stored, non-relational, non-computed fields in one query.
+
+    The other fields are fetched one by one by _field_value, so that
+    expensive computations don't happen for other records.
+    """
+    stored = [name for name in field_names if _is_plain_stored(record._fields[name])]
+    if not stored or not record:
+        return
+    try:
+        with util.savepoint(record.env.cr):
+            record.read(stored)
+    except Exception:
+        # _field_value will run into the problem again, once per field
+        pass
+
+
+if MYPY:
+    # (value, exception raised while getting it)
+    _FieldValue = t.Tuple[object, t.Optional[Exception]]
+
+# (model name, field name) -> seconds it took to get the field's value last time
+field_timings = {}  # type: t.Dict[t.Tuple[t.Text, t.Text], float]
+# (model name, id) -> fields that were skipped when the record was last shown
+skipped_fields = {}  # type: t.Dict[t.Tuple[t.Text, object], t.List[t.Text]]
+
+
+class SkippedField(Exception):
+    """A field wasn't evaluated because it's too slow."""
+
+    def __init__(self, seconds=None):
+        # type: (t.Optional[float]) -> None
+        super(SkippedField, self).__init__(seconds)
+        self.seconds = seconds
+
+    def __str__(self):
+        # type: () -> str
+        if self.seconds is None:
+            return "<skipped>"
+        return "<skipped: {:.1f}s>".format(self.seconds)
+
+
+def _field_values(
+    owner,  # type: BaseModel
+    field_names,  # type: t.List[t.Text]
+    force=False,  # type: bool
+    start=None,  # type: t.Optional[float]
+    skipped=None,  # type: t.Optional[t.List[t.Text]]
+):
+    # type: (...) -> t.Iterator[_FieldValue]
+    """Get field values like _field_value, within the configured time budgets.
+
+    A field that took longer than config.field_budget last time is skipped.
+    Once config.record_budget is used up, counting from start, all fields
+    that aren't already loaded are skipped. Their names are added to
+    skipped. force=True ignores both budgets.
+    """
+    if start is None:
+        start = time.time()
+    for field_name in field_names:
+        key = (owner._name, field_name)
+        known = field_timings.get(key)
+        too_slow = known is not None and 0 < config.field_budget < known
+        out_of_time = (
+            0 < config.record_budget < time.time() - start
+            and not _is_plain_stored(owner._fields[field_name])
+            and not _is_cached(owner, owner._fields[field_name])
+        )
+        if not force and (too_slow or out_of_time):
+            if skipped is not None:
+                skipped.append(field_name)
+            yield None, SkippedField(known)
+            continue
+        field_start = time.time()
+        value = _field_value(owner, field_name)
+        field_timings[key] = time.time() - field_start
+        yield value
+
+
+def _field_value(owner, field_name):
+    # type: (BaseModel, t.Text) -> _FieldValue
+    """Get a record's field value, or the exception that getting it raised."""
     if hasattr(owner.env, "prefetch"):  # Not all Odoo versions
         # The prefetch cache may be filled up by previous calls, see record_repr
         owner.env.prefetch.clear()
     try:
-        obj = getattr(owner, field_name)  # type: object
+        return getattr(owner, field_name), None
     except Exception as err:
-        return color.missing(type(err).__name__)
+        return None, err
+
+
+def _is_plain_stored(field):
+    # type: (odoo.fields.Field) -> bool
+    return bool(
+        field.store and not field.relational and not getattr(field, "compute", None)
+    )
+
+
+def _is_cached(record, field):
+    # type: (BaseModel, odoo.fields.Field) -> bool
+    """Whether the field's value for the record is already loaded."""
+    try:
+        if hasattr(record.env.cache, "contains"):
+            return bool(record.env.cache.contains(record, field))
+        # Odoo 10 and earlier
+        return field.name in record._cache
+    except Exception:
+        return False
+
+
+def _color_repr(owner, field_name, obj, error=None):
+    # type: (BaseModel, t.Text, object, t.Optional[Exception]) -> t.Text
+    """Return a color-coded representation of a record's field value."""
+    if isinstance(error, SkippedField):
+        return color.missing(str(error))
+    if error is not None:
+        return color.missing(type(error).__name__)
     # We don't want to show passwords by default.
     # But if it's not a string then it's either a missing value (which is fine
     # to reveal) or a field that doesn't contain a password at all.
@@ -132,6 +315,7 @@ def _get_create_write_history(obj):
 def _repr_pretty_(self, printer, _cycle):
     # type: (BaseModel, t.Any, t.Any) -> None
     if printer.indentation == 0 and hasattr(self, "_ids"):
+        warmup.record_use(self._name)
         printer.text(record_repr(self))
     else:
         printer.text(repr(self))
@@ -182,16 +366,35 @@ def filtered_(
 
     .filtered_(state='done') is equivalent to
     .filtered(lambda x: x.state == 'done').
+
+    Operators work like in ._(), e.g. .filtered_(state__ne='done'). If the
+    fields are stored the filter is evaluated with a single search.
     """
     this = self
-    if func:
-        this = this.filtered(func)
     if field_vals:
-        this = this.filtered(
-            lambda record: all(
-                getattr(record, field) == value for field, value in field_vals.items()
+        domain = None
+        if self._ids and not any(
+            isinstance(ident, odoo.models.NewId) for ident in self._ids
+        ):
+            domain = search.stored_domain(self, field_vals)
+        if domain is not None:
+            found = set(
+                self.sudo()
+                .with_context(active_test=False)
+                .search([("id", "in", list(set(self._ids)))] + domain)
+                ._ids
             )
-        )
+            this = self.browse([ident for ident in self._ids if ident in found])
+        else:
+            clauses = search.parse_field_vals(field_vals)
+            this = this.filtered(
+                lambda record: all(
+                    search.matches(record, field, operator, value)
+                    for field, operator, value in clauses
+                )
+            )
+    if func:
+        this = this.filtered(func)
     return this
 
 
@@ -200,12 +403,18 @@ def source_(record, location=None, context=False):
     # type: (BaseModel, t.Optional[t.Text], bool) -> None
     import lxml.etree
 
+    by_record = util.record_xml_ids(record)
     for rec in record:
-        for rec_id in reversed(util.xml_ids(rec)):
+        rec_ids = list(reversed(by_record[rec.id]))
+        sources.ensure_xml_records(rec_ids)
+        for rec_id in rec_ids:
             for definition in sources.xml_records[rec_id]:
                 if location is not None and definition.module != location:
                     continue
-                elem = definition.elem.getroottree() if context else definition.elem
+                elem = definition.parse_file() if context else definition.elem
+                if elem is None:
+                    # The file changed since it was indexed
+                    continue
                 print(sources.format_source(definition.to_source()))
                 src = lxml.etree.tostring(elem, encoding="unicode")
                 print(color.highlight(src, "xml"), end="\n\n")
@@ -233,15 +442,21 @@ def grep_(record, *args, **kwargs):
     import lxml.etree
 
     argv = grep.build_grep_argv(args, kwargs)
+    by_record = util.record_xml_ids(record)
     for rec in record:
-        for rec_id in reversed(util.xml_ids(rec)):
+        rec_ids = list(reversed(by_record[rec.id]))
+        sources.ensure_xml_records(rec_ids)
+        for rec_id in rec_ids:
             for definition in sources.xml_records[rec_id]:
+                elem = definition.elem
+                if elem is None:
+                    continue
                 try:
                     grep.partial_grep(
                         argv,
-                        lxml.etree.tostring(definition.elem, encoding="unicode"),
+                        lxml.etree.tostring(elem, encoding="unicode"),
                         header=definition.fname,
-                        lnum=definition.elem.sourceline,
+                        lnum=definition.lnum,
                     )
                 except grep.BadCommandline as err:
                     print(err, file=sys.stderr)
@@ -252,8 +467,180 @@ def grep_(record, *args, **kwargs):
                     print()
 
 
+@util.patch(BaseModel)
+def timings_(self):
+    # type: (BaseModel) -> None
+    """Show how long the model's fields took to display, slowest first.
+
+    Fields that are over config.field_budget are skipped from now on, they
+    can still be shown with .force_().
+    """
+    timings = sorted(
+        (
+            (seconds, field_name)
+            for (model_name, field_name), seconds in field_timings.items()
+            if model_name == self._name
+        ),
+        reverse=True,
+    )
+    if not timings:
+        return
+    max_len = max(len(field_name) for _, field_name in timings)
+    for seconds, field_name in timings:
+        line = "{}: {}{:.3f}s".format(
+            color.field(field_name), (max_len - len(field_name)) * " ", seconds
+        )
+        if 0 < config.field_budget < seconds:
+            line += " " + color.missing("(skipped)")
+        print(line)
+
+
+@util.patch(BaseModel)
+def force_(record, *field_names):
+    # type: (BaseModel, t.Text) -> None
+    """Show fields that were skipped for being slow, or the given fields.
+
+    Their timings are updated, so if they've become fast they won't be
+    skipped anymore.
+    """
+    for rec in record:
+        names = list(field_names) or skipped_fields.get((rec._name, rec.id), [])
+        if not names:
+            continue
+        print(color.record_header(rec))
+        max_len = max(len(name) for name in names)
+        if not isinstance(rec.id, odoo.models.NewId):
+            rec = rec.with_context(odoo_repl=True)
+        values = _field_values(rec, names, force=True)
+        for name, (value, error) in zip(names, values):
+            print(
+                "{}: ".format(color.field(name))
+                + (max_len - len(name)) * " "
+                + _color_repr(rec, name, value, error)
+                + " ({:.1f}s)".format(field_timings[rec._name, name])
+            )
+        key = (rec._name, rec.id)
+        still_skipped = [
+            name for name in skipped_fields.get(key, []) if name not in names
+        ]
+        if still_skipped:
+            skipped_fields[key] = still_skipped
+        else:
+            skipped_fields.pop(key, None)
+
+
 @util.patch(BaseModel)
 def shuf_(record, num=1):
     # type: (odoo.models.AnyModel, int) -> odoo.models.AnyModel
     num = min(len(record), num)
     return record.browse(random.sample(record._ids, num))
+
+
+@util.patch(BaseModel)
+def table_(record, *field_names, **kwargs):
+    # type: (BaseModel, t.Text, t.Any) -> None
+    """Print fields of the records as an aligned table.
+
+    Without arguments only the display name is shown. Plain stored fields
+    are fetched with a query per chunk of records, other fields are read
+    through the ORM a chunk at a time. The first chunk decides the column
+    widths, values longer than max_width (default 40) are cut off.
+
+    Output goes through a pager if stdout is a terminal, pass pager=False
+    to avoid that.
+    """
+    max_width = kwargs.pop("max_width", 40)  # type: int
+    pager = kwargs.pop("pager", None)  # type: t.Optional[bool]
+    if kwargs:
+        raise TypeError("Unknown arguments: {}".format(", ".join(kwargs)))
+    record = util.unwrap(record)
+    names = ["id"] + list(field_names or ["display_name"])
+    for name in names:
+        if name not in record._fields:
+            raise ValueError("Field {!r} doesn't exist".format(name))
+    lines = _table_lines(record, names, max_width)
+    if pager is None:
+        pager = bool(config.pager) and sys.stdout.isatty()
+    if pager and util.page(lines, separator=""):
+        return
+    for line in lines:
+        print(line)
+
+
+def _table_lines(record, names, max_width):
+    # type: (BaseModel, t.List[t.Text], int) -> t.Iterator[t.Text]
+    widths = None  # type: t.Optional[t.List[int]]
+    for rows in _table_chunks(record, names):
+        if widths is None:
+            widths = [
+                min(max(len(cell) for cell in column), max_width)
+                for column in zip(names, *rows)
+            ]
+            # Later chunks can have longer ids, those should never be cut off
+            max_id = max(
+                ident
+                for ident in record._ids
+                if not isinstance(ident, odoo.models.NewId)
+            )
+            widths[0] = max(widths[0], len(str(max_id)))
+            yield color.header(_table_line(names, widths))
+        for row in rows:
+            yield _table_line(row, widths)
+
+
+def _table_line(cells, widths):
+    # type: (t.Sequence[t.Text], t.List[int]) -> t.Text
+    fitted = []
+    for cell, width in zip(cells, widths):
+        if len(cell) > width:
+            cell = cell[: max(width - 1, 0)] + u"…"
+        fitted.append(cell.ljust(width))
+    return u"  ".join(fitted).rstrip()
+
+
+def _table_chunks(record, names):
+    # type: (BaseModel, t.List[t.Text]) -> t.Iterator[t.List[t.List[t.Text]]]
+    fields = [record._fields[name] for name in names]
+    sql_names = [
+        field.name
+        for field in fields
+        if record._auto and util.is_plain_column(field) and field.type != "many2one"
+    ]
+    orm_names = [field.name for field in fields if field.name not in sql_names]
+    ids = [ident for ident in record._ids if not isinstance(ident, odoo.models.NewId)]
+    size = max(config.chunk_size, 1)
+    for start in range(0, len(ids), size):
+        chunk_ids = ids[start : start + size]
+        values = {
+            ident: {} for ident in chunk_ids
+        }  # type: t.Dict[int, t.Dict[t.Text, object]]
+        if sql_names:
+            query = 'SELECT id, {} FROM "{}" WHERE id IN %s'.format(
+                ", ".join('"{}"'.format(name) for name in sql_names), record._table
+            )
+            for row in util.sql(record.env, query, tuple(chunk_ids)):
+                values[row[0]].update(zip(sql_names, row[1:]))
+        if orm_names:
+            chunk = record.browse(chunk_ids)
+            for row in chunk.read([name for name in orm_names if name != "id"]):
+                values[row["id"]].update(row)
+        yield [
+            [_table_cell(values[ident].get(field.name), field) for field in fields]
+            for ident in chunk_ids
+        ]
+
+
+def _table_cell(value, field):
+    # type: (object, odoo.fields.Field) -> t.Text
+    if field.type == "boolean":
+        return u"{}".format(bool(value))
+    if value is None or value is False:
+        return u""
+    if isinstance(value, tuple) and len(value) == 2:
+        # many2one as returned by read()
+        value = value[1]
+    elif isinstance(value, list):
+        return u",".join(u"{}".format(ident) for ident in value)
+    if not isinstance(value, Text):
+        value = u"{}".format(value)
+    return util.try_decode(value).replace(u"\n", u" ")  # type: ignore
@@ -1,6 +1,8 @@
+import numbers
+import operator
 import random
 
-from odoo_repl.imports import t, BaseModel, Text
+from odoo_repl.imports import t, BaseModel, Field, Text
 from odoo_repl import util
 
 # Map identifier-friendly names to the operators Odoo understands
@@ -33,6 +35,13 @@ OPERATORS = {
 
 PLURAL_OPERATORS = {"in", "not_in", "notin"}
 
+# Tables estimated to have fewer rows are sampled from all their ids
+SAMPLE_MIN = 100000
+# Number of rows to pick from a big table to sample from
+SAMPLE_CANDIDATES = 1000
+# Most rows to pick in one try if the domain doesn't match enough of them
+SAMPLE_MAX_CANDIDATES = 100000
+
 
 def search(
     model,  # type: BaseModel
@@ -51,18 +60,9 @@ def search(
     shuf = field_vals.pop("shuf", None)  # type: t.Optional[int]
     if not field_vals.pop("active_test", True):
         model = model.with_context(active_test=False)
-    if shuf and not (args or field_vals or offset or limit or count):
-        # Doing a search seeds the cache with IDs, which tanks performance
-        # Odoo will compute fields on many records at once even though you
-        # won't use them
-        query = "SELECT id FROM {}".format(model._table)
-        if "active" in model._fields and not model._fields["active"].related:
-            # TODO: handle related active fields
-            query += " WHERE active = true"
-        all_ids = util.sql(model.env, query)
-        shuf = min(shuf, len(all_ids))
-        return model.browse(random.sample(all_ids, shuf))
     clauses = _parse_search_query(args, field_vals, model)
+    if shuf and not (offset or limit or count):
+        return sample(model, clauses, shuf)
     result = model.search(clauses, offset=offset, limit=limit, order=order, count=count)
     if shuf:
         shuf = min(shuf, len(result))
@@ -70,6 +70,55 @@ def search(
     return result
 
 
+def sample(model, clauses, num):
+    # type: (BaseModel, t.List[t.Any], int) -> BaseModel
+    """Pick random records that match a domain.
+
+    Big tables are sampled with TABLESAMPLE, so only a small part of the
+    table has to be read and only a few ids are fetched. Smaller tables,
+    and domains so selective that sampling doesn't find enough matches,
+    get a uniform sample of all matching ids.
+    """
+    if model._auto and model.env.cr._cnx.server_version >= 90500:
+        estimate = util.estimate_count(model)
+        if estimate >= SAMPLE_MIN:
+            found = _sample_table(model, clauses, num, estimate)
+            if found is not None:
+                return found
+    if clauses:
+        result = model.search(clauses)
+        return result.browse(random.sample(result._ids, min(num, len(result))))
+    # Doing a search seeds the cache with IDs, which tanks performance
+    # Odoo will compute fields on many records at once even though you
+    # won't use them
+    query = 'SELECT id FROM "{}"'.format(model._table)
+    active = util.active_column(model)
+    if active:
+        query += ' WHERE "{}" = true'.format(active)
+    all_ids = util.sql(model.env, query)
+    return model.browse(random.sample(all_ids, min(num, len(all_ids))))
+
+
+def _sample_table(model, clauses, num, estimate):
+    # type: (BaseModel, t.List[t.Any], int, int) -> t.Optional[BaseModel]
+    # SYSTEM sampling picks whole pages, so take many more rows than needed
+    # to spread the result over the table
+    size = max(num * 20, SAMPLE_CANDIDATES)
+    query = 'SELECT id FROM "{}" TABLESAMPLE SYSTEM (%s)'.format(model._table)
+    while size <= SAMPLE_MAX_CANDIDATES and size < estimate:
+        candidates = util.sql(model.env, query, 100.0 * size / estimate)
+        if len(candidates) >= num:
+            found = model.search(clauses + [("id", "in", candidates)])._ids
+            if len(found) >= num:
+                return model.browse(random.sample(found, num))
+        if size == SAMPLE_MAX_CANDIDATES:
+            break
+        size = min(size * 10, SAMPLE_MAX_CANDIDATES)
+    # If that many rows didn't have enough matches the domain is selective,
+    # so searching for all matches is cheap enough
+    return None
+
+
 def _parse_search_query(
     args,  # type: t.Sequence[object]
     field_vals,  # type: t.Mapping[str, object]
@@ -112,19 +161,7 @@ def _parse_search_query(
             "Couldn't divide into leaves: {!r}".format(clauses + [tuple(curr)])
         )
 
-    for key, value in field_vals.items():
-        # Double underscore splitting, inspired by Django's ORM:
-        # https://docs.djangoproject.com/en/3.0/topics/db/queries/#field-lookups
-        # https://docs.djangoproject.com/en/3.0/ref/models/querysets/#field-lookups
-        # Unfortunately I've never used Django so this could be different in
-        # pointless or harmful ways
-        # This ruins searches on the __last_update field, but that may be ok
-        components = key.split("__")
-        if len(components) > 1 and components[-1] in OPERATORS:
-            operator = OPERATORS[components.pop()]
-        else:
-            operator = "="
-        clauses.append((".".join(components), operator, value))
+    clauses.extend(parse_field_vals(field_vals))
 
     def to_id(thing, plural=False):
         # type: (object, bool) -> t.Any
@@ -143,3 +180,132 @@ def _parse_search_query(
     clauses = to_id(clauses)
 
     return clauses
+
+
+def parse_field_vals(field_vals):
+    # type: (t.Mapping[str, object]) -> t.List[t.Tuple[str, str, object]]
+    clauses = []
+    for key, value in field_vals.items():
+        # Double underscore splitting, inspired by Django's ORM:
+        # https://docs.djangoproject.com/en/3.0/topics/db/queries/#field-lookups
+        # https://docs.djangoproject.com/en/3.0/ref/models/querysets/#field-lookups
+        # Unfortunately I've never used Django so this could be different in
+        # pointless or harmful ways
+        # This ruins searches on the __last_update field, but that may be ok
+        components = key.split("__")
+        if len(components) > 1 and components[-1] in OPERATORS:
+            op = OPERATORS[components.pop()]
+        else:
+            op = "="
+        clauses.append((".".join(components), op, value))
+    return clauses
+
+
+# Operators that can be evaluated in Python, for fields that aren't stored
+PYTHON_OPERATORS = {
+    "=": operator.eq,
+    "!=": operator.ne,
+    "<=": operator.le,
+    "<": operator.lt,
+    ">": operator.gt,
+    ">=": operator.ge,
+    "in": lambda left, right: left in right,
+    "not in": lambda left, right: left not in right,
+}  # type: t.Dict[str, t.Callable[[t.Any, t.Any], bool]]
+
+
+def matches(record, path, op, value):
+    # type: (BaseModel, str, str, object) -> bool
+    """Evaluate a clause from parse_field_vals on a single record."""
+    if op not in PYTHON_OPERATORS:
+        raise ValueError("Operator {!r} only works on stored fields".format(op))
+    actual = record  # type: t.Any
+    for name in path.split("."):
+        actual = actual[name]
+    if isinstance(actual, BaseModel) and not isinstance(value, BaseModel):
+        if len(actual) <= 1:
+            # Compare by id, like a domain would
+            actual = actual.id
+        elif op in {"in", "not in"}:
+            # Like in a domain, an x2many is in a list if any of its ids is
+            found = any(ident in value for ident in actual._ids)  # type: ignore
+            return found == (op == "in")
+    return PYTHON_OPERATORS[op](actual, value)
+
+
+def stored_path(model, path):
+    # type: (BaseModel, t.Text) -> t.Optional[t.List[Field]]
+    """The fields along a dotted path, if they're all stored in the database."""
+    names = path.split(".")
+    fields = []
+    for ind, name in enumerate(names):
+        field = model._fields.get(name)
+        if field is None or not field.store:
+            return None
+        fields.append(field)
+        if ind < len(names) - 1:
+            if not field.relational:
+                return None
+            model = model.env[field.comodel_name]
+    return fields
+
+
+def stored_domain(model, field_vals):
+    # type: (BaseModel, t.Mapping[str, object]) -> t.Optional[t.List[t.Any]]
+    """Turn keyword filters into a domain, if the database can evaluate it.
+
+    That's not the case if a field isn't stored, or if an x2many field is
+    compared directly, which means something else in a domain than in Python.
+
+    Unset numbers are NULL in the database but 0 in Python, so NULL is
+    matched exactly when 0 would be.
+    """
+    domain = []  # type: t.List[t.Any]
+    for left, op, right in _parse_search_query((), field_vals, model):
+        fields = stored_path(model, left)
+        if fields is None:
+            return None
+        if fields[-1].type in {"one2many", "many2many"} and op in {"=", "!="}:
+            return None
+        if fields[-1].type in _NUMERIC_TYPES:
+            zero = _matches_zero(op, right)
+            if zero or op in {"!=", "not in"}:
+                if len(fields) > 1:
+                    # An unset relation in between would also read as 0
+                    return None
+                if zero:
+                    domain.extend(["|", (left, "=", False)])
+                else:
+                    # Odoo lets negative operators match NULL
+                    domain.append((left, "!=", False))
+        domain.append((left, op, right))
+    return domain
+
+
+_NUMERIC_TYPES = {"integer", "float", "monetary"}
+
+
+def _matches_zero(op, value):
+    # type: (str, object) -> bool
+    if op in {"in", "not in"}:
+        if not isinstance(value, (list, tuple, set, frozenset)):
+            return False
+        return (0 in value) == (op == "in")
+    if op not in PYTHON_OPERATORS or isinstance(value, bool):
+        return False
+    if not isinstance(value, numbers.Real):
+        return False
+    return PYTHON_OPERATORS[op](0, value)
+
+
+def truthy_domain(model, path):
+    # type: (BaseModel, t.Text) -> t.Optional[t.List[t.Any]]
+    """A domain for .filtered(path), if the database can evaluate it.
+
+    Only boolean and relational fields are falsy exactly when the database
+    considers them unset, zeroes and empty strings don't match in SQL.
+    """
+    fields = stored_path(model, path)
+    if fields is None or not (fields[-1].relational or fields[-1].type == "boolean"):
+        return None
+    return [(path, "!=", False)]
@@ -1,10 +1,17 @@
 """Functions for finding source code."""
 
+import ast
 import collections
 import inspect
+import itertools
 import linecache
+import multiprocessing
 import os
+import pickle
 import re
+import threading
+import time
+import weakref
 
 import odoo_repl
 
@@ -60,10 +67,11 @@ class Source(_Source):
     @classmethod
     def from_cls(cls, src_cls):
         # type: (t.Type[BaseModel]) -> Source
+        py_class = _find_py_class(src_cls)
         return cls(
             util.module(src_cls),
             getsourcefile(src_cls),
-            inspect.getsourcelines(src_cls)[1],
+            py_class[0] if py_class else inspect.getsourcelines(src_cls)[1],
         )
 
 
@@ -76,6 +84,119 @@ def getsourcefile(thing):
         return "???"
 
 
+if MYPY:
+    # (first line, attribute name -> line of its first definition)
+    _PyClass = t.Tuple[int, t.Dict[t.Text, int]]
+    # qualified class name -> classes with that name
+    _PyFileIndex = t.Dict[t.Text, t.List[_PyClass]]
+    _Stamp = t.Tuple[float, int]
+
+# fname -> ((mtime, size), index or None if the file can't be parsed)
+_py_index = {}  # type: t.Dict[t.Text, t.Tuple[_Stamp, t.Optional[_PyFileIndex]]]
+
+
+def _index_py_file(fname):
+    # type: (t.Text) -> t.Optional[_PyFileIndex]
+    """Get the classes in a Python file, parsing it only if it changed."""
+    try:
+        stat = os.stat(fname)
+    except OSError:
+        return None
+    stamp = (stat.st_mtime, stat.st_size)
+    if fname in _py_index and _py_index[fname][0] == stamp:
+        return _py_index[fname][1]
+    index = None  # type: t.Optional[_PyFileIndex]
+    try:
+        with open(fname, "rb") as f:
+            tree = ast.parse(f.read(), fname)
+    except (SyntaxError, ValueError, TypeError, IOError):
+        pass
+    else:
+        index = {}
+        _index_py_classes(tree, "", index)
+    _py_index[fname] = (stamp, index)
+    return index
+
+
+def _index_py_classes(node, prefix, index):
+    # type: (ast.AST, t.Text, _PyFileIndex) -> None
+    for child in ast.iter_child_nodes(node):
+        if isinstance(child, ast.ClassDef):
+            qualname = prefix + child.name
+            names = {}  # type: t.Dict[t.Text, int]
+            _index_py_names(child.body, names)
+            index.setdefault(qualname, []).append((_first_line(child), names))
+            _index_py_classes(child, qualname + ".", index)
+        elif isinstance(child, _FUNCTION_DEFS):
+            _index_py_classes(child, prefix + child.name + ".<locals>.", index)
+        elif isinstance(child, ast.stmt):
+            _index_py_classes(child, prefix, index)
+
+
+def _index_py_names(body, names):
+    # type: (t.List[ast.stmt], t.Dict[t.Text, int]) -> None
+    for stmt in body:
+        if isinstance(stmt, ast.Assign):
+            for target in stmt.targets:
+                if not isinstance(target, ast.Name):
+                    continue
+                names.setdefault(target.id, stmt.lineno)
+                if target.id == "_columns" and isinstance(stmt.value, ast.Dict):
+                    # Old-style fields
+                    for key in stmt.value.keys:
+                        name = _string_value(key)
+                        if name is not None:
+                            names.setdefault(name, key.lineno)
+        elif isinstance(stmt, getattr(ast, "AnnAssign", ())):
+            if isinstance(stmt.target, ast.Name):  # type: ignore
+                names.setdefault(stmt.target.id, stmt.lineno)  # type: ignore
+        elif isinstance(stmt, (ast.ClassDef,) + _FUNCTION_DEFS):
+            names.setdefault(stmt.name, _first_line(stmt))
+
+
+def _first_line(node):
+    # type: (t.Any) -> int
+    # Like inspect, count decorators as part of the definition
+    return min([node.lineno] + [dec.lineno for dec in node.decorator_list])
+
+
+def _string_value(node):
+    # type: (t.Optional[ast.AST]) -> t.Optional[t.Text]
+    if isinstance(node, getattr(ast, "Constant", ())):
+        value = node.value  # type: ignore
+    else:
+        value = getattr(node, "s", None)  # ast.Str before Python 3.8
+    return value if isinstance(value, (str, t.Text)) else None
+
+
+_FUNCTION_DEFS = (ast.FunctionDef,) + (
+    (ast.AsyncFunctionDef,) if hasattr(ast, "AsyncFunctionDef") else ()
+)  # type: t.Tuple[t.Type[ast.stmt], ...]
+
+
+def _find_py_class(cls):
+    # type: (type) -> t.Optional[_PyClass]
+    """Find a class in the AST index, or None if that doesn't work."""
+    fname = getsourcefile(cls)
+    index = _index_py_file(fname)
+    if index is None:
+        return None
+    candidates = index.get(getattr(cls, "__qualname__", cls.__name__), [])
+    if len(candidates) == 1:
+        return candidates[0]
+    if not candidates:
+        return None
+    # Several classes with the same name in one file, defer to inspect
+    try:
+        lnum = inspect.getsourcelines(cls)[1]
+    except (IOError, TypeError):
+        return None
+    for candidate in candidates:
+        if candidate[0] == lnum:
+            return candidate
+    return None
+
+
 def find_source(thing):
     # type: (Sourceable) -> t.List[Source]
     if isinstance(thing, BaseModel) and hasattr(thing, "_ids"):
@@ -131,16 +252,18 @@ def find_model_source(model):
 
 def find_record_source(record):
     # type: (BaseModel) -> t.List[Source]
-    return [
-        Source(defin.module, defin.fname, defin.elem.sourceline)
-        for rec in record
+    res = []
+    by_record = util.record_xml_ids(record)
+    for rec in record:
         # We want the "oldest" sources at the end, to match finders
         # that go by MRO.
         # So we reverse xml_ids, because that one puts inheriting views
         # (newer) at the end.
-        for rec_id in reversed(util.xml_ids(rec))
-        for defin in xml_records[rec_id]
-    ]
+        rec_ids = list(reversed(by_record[rec.id]))
+        ensure_xml_records(rec_ids)
+        for rec_id in rec_ids:
+            res.extend(defin.to_source() for defin in xml_records[rec_id])
+    return res
 
 
 def find_field_source(field):
@@ -151,55 +274,157 @@ def find_field_source(field):
             if cls.__module__ in {"odoo.api", "openerp.api"}:
                 continue
             fname = getsourcefile(cls)
-            lines, lnum = inspect.getsourcelines(cls)
-            for line in lines:
-                match = RE_FIELD.match(line)
-                if match and match.group(1) == field.name:
-                    break
-                lnum += 1
+            py_class = _find_py_class(cls)
+            if py_class is not None:
+                lnum = py_class[1].get(field.name)  # type: t.Optional[int]
             else:
-                lnum = None  # type: ignore
+                lnum = _scan_field_line(cls, field.name)
             res.append(Source(util.module(cls), fname, lnum))
     return res
 
 
+def _scan_field_line(cls, name):
+    # type: (type, t.Text) -> t.Optional[int]
+    lines, lnum = inspect.getsourcelines(cls)
+    for line in lines:
+        match = RE_FIELD.match(line)
+        if match and match.group(1) == name:
+            return lnum
+        lnum += 1
+    return None
+
+
+if MYPY:
+    # field name -> [first module to define it, all modules that define it]
+    _FieldModules = t.Dict[t.Text, t.List[t.Any]]
+    _FieldModuleIndex = weakref.WeakKeyDictionary[t.Type[BaseModel], _FieldModules]
+
+# model class -> _FieldModules, dropped along with the registry
+_field_modules = weakref.WeakKeyDictionary()  # type: _FieldModuleIndex
+
+
+def _get_field_modules(field):
+    # type: (Field) -> t.List[t.Any]
+    model = util.env[field.model_name]
+    model_cls = type(model)
+    try:
+        index = _field_modules[model_cls]
+    except KeyError:
+        index = _field_modules[model_cls] = {}
+        names = set(model._fields)
+        for cls in reversed(model_cls.__mro__):
+            defined = names.intersection(vars(cls))
+            defined.update(names.intersection(getattr(cls, "_columns", ())))
+            if not defined:
+                continue
+            module = getattr(cls, "_module", None)  # type: t.Optional[t.Text]
+            for name in defined:
+                entry = index.setdefault(name, [None, set()])
+                if module and entry[0] is None:
+                    entry[0] = module
+                if module and cls.__module__ not in {"odoo.api", "openerp.api"}:
+                    entry[1].add(module)
+    return index.get(field.name, [None, set()])
+
+
 def find_field_module(field):
     # type: (Field) -> t.Optional[t.Text]
     # In Odoo 10+ (or 9+?) fields have a ._module attribute, but it points to
     # the latest module to define the field, not the first, so we can't use it
-    for cls in reversed(type(util.env[field.model_name]).__mro__):
-        if field.name in getattr(cls, "_columns", ()) or field.name in vars(cls):
-            module = getattr(cls, "_module", None)  # type: t.Optional[t.Text]
-            if module:
-                return module
-    return None
+    return _get_field_modules(field)[0]
 
 
 def find_field_modules(field):
     # type: (Field) -> t.Set[t.Text]
-    modules = set()
-    for cls in reversed(type(util.env[field.model_name]).__mro__):
-        if field.name in getattr(cls, "_columns", ()) or field.name in vars(cls):
-            module = getattr(cls, "_module", None)  # type: t.Optional[t.Text]
-            if module and cls.__module__ not in {"odoo.api", "openerp.api"}:
-                modules.add(module)
-    return modules
+    return set(_get_field_modules(field)[1])
 
 
-def find_method_source(method):
-    # type: (odoo_repl.methods.MethodProxy) -> t.List[Source]
-    res = []
-    for cls in type(method.model).__mro__[1:]:
-        if method.name in vars(cls):
-            func = util.unpack_function(vars(cls)[method.name])
-            res.append(
-                Source(
+if MYPY:
+    _MethodLink = t.NamedTuple(
+        "_MethodLink",
+        [
+            ("module", t.Text),
+            ("name", t.Text),
+            ("fname", t.Text),
+            ("func", t.Callable[..., t.Any]),
+            ("attr", t.Any),
+            ("cls", t.Optional[type]),
+        ],
+    )
+else:
+    _MethodLink = collections.namedtuple(
+        "_MethodLink", ("module", "name", "fname", "func", "attr", "cls")
+    )
+
+
+class MethodLink(_MethodLink):
+    """A single definition of a method in a model's MRO.
+
+    func is the unwrapped function, attr the class attribute as it is. cls is
+    only set if the definition can be found in the AST index.
+    """
+
+    __slots__ = ()
+
+    @property
+    def lnum(self):
+        # type: () -> int
+        if self.cls is not None:
+            py_class = _find_py_class(self.cls)
+            if py_class is not None and self.name in py_class[1]:
+                return py_class[1][self.name]
+        return inspect.getsourcelines(self.func)[1]
+
+    def to_source(self):
+        # type: () -> Source
+        return Source(self.module, self.fname, self.lnum)
+
+
+if MYPY:
+    _MethodChains = weakref.WeakKeyDictionary[type, t.Dict[t.Text, t.List[MethodLink]]]
+
+# model class -> method name -> definitions, dropped along with the registry
+_method_chains = weakref.WeakKeyDictionary()  # type: _MethodChains
+
+
+def method_chain(model, name):
+    # type: (BaseModel, t.Text) -> t.List[MethodLink]
+    """Find the definitions of a method, from the newest override to the oldest.
+
+    The model's own class is not included.
+    """
+    model_cls = type(model)
+    chains = _method_chains.setdefault(model_cls, {})
+    if name not in chains:
+        chain = []
+        for cls in model_cls.__mro__[1:]:
+            if name not in vars(cls):
+                continue
+            attr = vars(cls)[name]
+            func = util.unpack_function(attr)
+            try:
+                fname = getsourcefile(func)
+            except TypeError:
+                fname = "???"
+            named_here = getattr(func, "__name__", None) == name
+            defined_here = named_here and fname == getsourcefile(cls)
+            chain.append(
+                MethodLink(
                     util.module(cls),
-                    getsourcefile(func),
-                    inspect.getsourcelines(func)[1],
+                    name,
+                    fname,
+                    func,
+                    attr,
+                    cls if defined_here else None,
                 )
             )
-    return res
+        chains[name] = chain
+    return chains[name]
+
+
+def find_method_source(method):
+    # type: (odoo_repl.methods.MethodProxy) -> t.List[Source]
+    return [link.to_source() for link in method_chain(method.model, method.name)]
 
 
 def extract_field_source(fname, lnum):
@@ -221,69 +446,566 @@ def extract_field_source(fname, lnum):
 
 
 if MYPY:
-    from lxml.etree import _ElementTree
+    from lxml.etree import _Element, _ElementTree
 
-    _RecordDef = t.NamedTuple(
-        "_RecordDef", [("module", t.Text), ("fname", t.Text), ("elem", _ElementTree)]
-    )
-else:
-    _RecordDef = collections.namedtuple("_RecordDef", ("module", "fname", "elem"))
 
+class RecordDef(object):
+    """The location of a record in a data file.
 
-class RecordDef(_RecordDef):
-    __slots__ = ()
+    There can be a great many of these, so they're kept small: the file is
+    stored as an index into xml_files, and the element is only parsed again
+    when it's needed.
+    """
+
+    __slots__ = ("xml_id", "file_id", "lnum", "end_lnum", "tag")
+
+    def __init__(self, xml_id, file_id, lnum, end_lnum, tag):
+        # type: (util.XmlId, int, int, t.Optional[int], t.Text) -> None
+        # The key in xml_records, shared rather than copied
+        self.xml_id = xml_id
+        self.file_id = file_id
+        self.lnum = lnum
+        # The line where the next element starts, the record ends at or
+        # before it. None if the record is the last element in the file.
+        self.end_lnum = end_lnum
+        self.tag = tag
+
+    @property
+    def module(self):
+        # type: () -> t.Text
+        return xml_files[self.file_id][0]
+
+    @property
+    def fname(self):
+        # type: () -> t.Text
+        return xml_files[self.file_id][1]
+
+    @property
+    def elem(self):
+        # type: () -> t.Optional[_Element]
+        """Parse the part of the file that contains the element."""
+        elem = _parse_fragment(self.fname, self.lnum, self.end_lnum, self.tag)
+        if elem is None or not _has_xml_id(elem, self.xml_id):
+            elem = _find_element(self.fname, self.lnum, self.xml_id)
+        return elem
+
+    def parse_file(self):
+        # type: () -> t.Optional[_ElementTree]
+        """Parse the whole file that contains the element."""
+        import lxml.etree
+
+        try:
+            return lxml.etree.parse(self.fname)
+        except Exception:
+            return None
 
     def to_source(self):
         # type: () -> Source
-        return Source(module=self.module, fname=self.fname, lnum=self.elem.sourceline)
+        return Source(module=self.module, fname=self.fname, lnum=self.lnum)
+
+    def __repr__(self):
+        # type: () -> str
+        return "{}({!r}, {!r}, {!r})".format(
+            self.__class__.__name__, self.module, self.fname, self.lnum
+        )
 
 
 xml_records = collections.defaultdict(
     list
 )  # type: t.DefaultDict[util.XmlId, t.List[RecordDef]]
 
+# (module, fname) pairs that RecordDef.file_id points into
+xml_files = []  # type: t.List[t.Tuple[t.Text, t.Text]]
+_xml_file_ids = {}  # type: t.Dict[t.Tuple[t.Text, t.Text], int]
 
-def populate_xml_records(modules):
+# Canonical tag strings, so that records share them
+_RECORD_TAGS = {tag: tag for tag in RECORD_TAGS}
+
+
+def _get_file_id(module, fname):
+    # type: (t.Text, t.Text) -> int
+    key = (module, fname)
+    if key not in _xml_file_ids:
+        _xml_file_ids[key] = len(xml_files)
+        xml_files.append(key)
+    return _xml_file_ids[key]
+
+
+# Bump this whenever the format of the cache changes
+XML_CACHE_VERSION = 2
+
+if MYPY:
+    # (xml id module, xml id name, first line, end line, tag)
+    _XmlEntry = t.Tuple[t.Text, t.Text, int, t.Optional[int], t.Text]
+    # (module, module path, demo) -> fname -> ((mtime, size), entries)
+    _XmlCache = t.Dict[
+        t.Tuple[t.Text, t.Text, bool],
+        t.Dict[t.Text, t.Tuple[t.Tuple[float, int], t.List[_XmlEntry]]],
+    ]
+    # [(fname, (mtime, size), entries or None if the file must be scanned)]
+    _XmlPlan = t.List[
+        t.Tuple[t.Text, t.Tuple[float, int], t.Optional[t.List[_XmlEntry]]]
+    ]
+    # (module, data files to scan)
+    _XmlJob = t.Tuple[t.Text, t.List[t.Text]]
+    # (cache key, (mtime, size) or None if the file is gone, entries)
+    _XmlFileInfo = t.Tuple[t.Any, t.Optional[t.Tuple[float, int]], t.List[_XmlEntry]]
+
+# Modules whose data files should be indexed, with their demo flags
+xml_modules = collections.OrderedDict()  # type: t.Dict[t.Text, bool]
+_xml_indexed = set()  # type: t.Set[t.Text]
+# Modules that a populate_xml_records() call is already working on
+_xml_claimed = set()  # type: t.Set[t.Text]
+_xml_lock = threading.RLock()
+_xml_ready = threading.Event()
+_xml_cache = None  # type: t.Optional[_XmlCache]
+# file_id -> info about the file as it was indexed, to notice changes
+_xml_file_info = {}  # type: t.Dict[int, _XmlFileInfo]
+_xml_ready.set()
+
+
+def schedule_xml_records(modules):
     # type: (t.Iterable[t.Tuple[t.Text, bool]]) -> None
-    import lxml.etree
+    """Register modules to be indexed by populate_xml_records.
+
+    After this, lookups of XML IDs in these modules index them on demand.
+    """
+    with _xml_lock:
+        for module, demo in modules:
+            if module not in xml_modules:
+                xml_modules[module] = bool(demo)
+        _update_ready()
+
+
+def populate_xml_records(modules=()):
+    # type: (t.Iterable[t.Tuple[t.Text, bool]]) -> None
+    """Index all scheduled modules. Meant to run in a background thread."""
+    schedule_xml_records(modules)
+    with _xml_lock:
+        cache = _get_xml_cache()
+        todo = [
+            (module, demo)
+            for module, demo in xml_modules.items()
+            if module not in _xml_indexed and module not in _xml_claimed
+        ]
+        _xml_claimed.update(module for module, _ in todo)
+
+    # Modules that are fully cached go in right away, the rest is scanned in
+    # parallel and added as each module finishes
+    to_scan = []  # type: t.List[t.Tuple[t.Text, t.Any, _XmlPlan]]
+    for module, demo in todo:
+        key, plan = _plan_xml_module(module, demo, cache)
+        if any(entries is None for _, _, entries in plan):
+            to_scan.append((module, key, plan))
+        else:
+            _merge_xml_module(module, key, plan)
+
+    jobs = [
+        (module, [fname for fname, _, entries in plan if entries is None])
+        for module, _, plan in to_scan
+    ]
+    # The generator goes first so that zip() exhausts it and the pool is closed
+    for scanned, (module, key, plan) in zip(_scan_xml_modules(jobs), to_scan):
+        scanned_iter = iter(scanned)
+        plan = [
+            (fname, stamp, next(scanned_iter) if entries is None else entries)
+            for fname, stamp, entries in plan
+        ]
+        _merge_xml_module(module, key, plan)
+
+    with _xml_lock:
+        _save_xml_cache(cache)
+
+
+def index_xml_module(module):
+    # type: (t.Text) -> None
+    """Index a scheduled module right away, if that didn't happen yet."""
+    with _xml_lock:
+        if module in _xml_indexed or module not in xml_modules:
+            return
+        key, plan = _plan_xml_module(module, xml_modules[module], _get_xml_cache())
+        _merge_xml_module(
+            module,
+            key,
+            [
+                (fname, stamp, _scan_xml_file(module, fname))
+                if entries is None
+                else (fname, stamp, entries)
+                for fname, stamp, entries in plan
+            ],
+        )
+
+
+def ensure_xml_records(xml_ids):
+    # type: (t.Iterable[util.XmlId]) -> None
+    """Make sure that the definitions of XML IDs are in xml_records and current.
+
+    Note that a module can define records for other modules, and those are
+    only found once the defining module is indexed.
+    """
+    xml_ids = list(xml_ids)
+    for xml_id in xml_ids:
+        index_xml_module(xml_id.module)
+    refresh_xml_records(
+        defin.file_id
+        for xml_id in xml_ids
+        if xml_id in xml_records
+        for defin in xml_records[xml_id]
+    )
+
+
+def wait_ready(timeout=None):
+    # type: (t.Optional[float]) -> bool
+    """Wait until all scheduled modules are indexed.
+
+    Returns whether that happened before the timeout.
+    """
+    _xml_ready.wait(timeout)
+    return _xml_ready.is_set()
+
+
+def xml_progress():
+    # type: () -> t.Tuple[int, int]
+    """Return the number of indexed modules and the number of scheduled modules."""
+    with _xml_lock:
+        return len(_xml_indexed), len(xml_modules)
+
+
+def _update_ready():
+    # type: () -> None
+    if len(_xml_indexed) >= len(xml_modules):
+        _xml_ready.set()
+    else:
+        _xml_ready.clear()
 
-    if xml_records:
-        # There is a race condition here but it seems hard enough to trigger
-        return
 
-    for module, demo in modules:
-        path = odoo.modules.module.get_module_path(module, display_warning=False)
-        if not path:
+def _get_xml_cache():
+    # type: () -> _XmlCache
+    global _xml_cache
+    with _xml_lock:
+        if _xml_cache is None:
+            _xml_cache = _load_xml_cache()
+        return _xml_cache
+
+
+def _plan_xml_module(module, demo, cache):
+    # type: (t.Text, bool, _XmlCache) -> t.Tuple[t.Any, _XmlPlan]
+    """Find a module's data files, and the cached records if they're current."""
+    path = odoo.modules.module.get_module_path(module, display_warning=False)
+    if not path:
+        return None, []
+    manifest = odoo.modules.module.load_information_from_description_file(
+        module, mod_path=path
+    )
+    path = os.path.realpath(path)
+    data_files = list(manifest.get("data", ()))
+    if demo:
+        data_files.extend(manifest.get("demo", ()))
+    key = (module, path, bool(demo))
+    cached_files = cache.get(key, {})
+    plan = []  # type: _XmlPlan
+    for fname in data_files:
+        if not fname.endswith(".xml"):
             continue
-        manifest = odoo.modules.module.load_information_from_description_file(
-            module, mod_path=path
+        fname = os.path.join(path, fname)
+        try:
+            stat = os.stat(fname)
+        except OSError:
+            continue
+        stamp = (stat.st_mtime, stat.st_size)
+        cached = cached_files.get(fname)
+        if cached is not None and cached[0] == stamp:
+            plan.append((fname, stamp, cached[1]))
+        else:
+            plan.append((fname, stamp, None))
+    return key, plan
+
+
+def _merge_xml_module(module, key, plan):
+    # type: (t.Text, t.Any, _XmlPlan) -> None
+    with _xml_lock:
+        if module in _xml_indexed:
+            # It was indexed on demand in the meantime
+            return
+        if key is not None:
+            _get_xml_cache()[key] = {
+                fname: (stamp, entries or []) for fname, stamp, entries in plan
+            }
+        for fname, stamp, entries in plan:
+            file_id = _get_file_id(module, fname)
+            _add_file_records(file_id, entries or [])
+            _xml_file_info[file_id] = (key, stamp, entries or [])
+        _xml_indexed.add(module)
+        _update_ready()
+
+
+def _add_file_records(file_id, entries):
+    # type: (int, t.List[_XmlEntry]) -> None
+    for rec_module, rec_name, lnum, end_lnum, tag in entries:
+        ident = util.XmlId(rec_module, rec_name)
+        xml_records[ident].append(
+            RecordDef(ident, file_id, lnum, end_lnum, _RECORD_TAGS.get(tag, tag))
         )
-        path = os.path.realpath(path)
-        data_files = list(manifest.get("data", ()))
-        if demo:
-            data_files.extend(manifest.get("demo", ()))
-        for fname in data_files:
-            if not fname.endswith(".xml"):
-                continue
-            fname = os.path.join(path, fname)
-            if not os.path.isfile(fname):
-                continue
+
+
+def _remove_file_records(file_id, entries):
+    # type: (int, t.List[_XmlEntry]) -> None
+    for rec_module, rec_name, _, _, _ in entries:
+        ident = util.XmlId(rec_module, rec_name)
+        defs = [defin for defin in xml_records[ident] if defin.file_id != file_id]
+        if defs:
+            xml_records[ident] = defs
+        else:
+            del xml_records[ident]
+
+
+def refresh_xml_records(file_ids=None):
+    # type: (t.Optional[t.Iterable[int]]) -> int
+    """Index data files again if they changed since they were indexed.
+
+    Only the given files are checked, or all of them if file_ids is None.
+    Returns the number of files that changed.
+
+    This doesn't notice data files that were added to a manifest.
+    """
+    changed = 0
+    with _xml_lock:
+        if file_ids is None:
+            file_ids = list(_xml_file_info)
+        for file_id in set(file_ids):
+            key, stamp, entries = _xml_file_info[file_id]
+            module, fname = xml_files[file_id]
             try:
-                tree = lxml.etree.parse(fname)
-            except Exception:  # Syntax error, for example
-                continue
-            for tag in RECORD_TAGS:
-                for record in tree.iterfind("//" + tag):
-                    if "id" not in record.attrib:
-                        continue
-                    rec_id = record.attrib["id"]
-                    if "." not in rec_id:
-                        ident = util.XmlId(module, rec_id)
-                    else:
-                        ident = util.XmlId(*rec_id.split("."))
-                    xml_records[ident].append(
-                        RecordDef(module=module, fname=fname, elem=record)
-                    )
+                stat = os.stat(fname)
+            except OSError:
+                if stamp is None:
+                    # Already known to be missing
+                    continue
+                new_stamp = None  # type: t.Optional[t.Tuple[float, int]]
+                new_entries = []  # type: t.List[_XmlEntry]
+            else:
+                new_stamp = (stat.st_mtime, stat.st_size)
+                if new_stamp == stamp:
+                    continue
+                new_entries = _scan_xml_file(module, fname)
+            changed += 1
+            _remove_file_records(file_id, entries)
+            _add_file_records(file_id, new_entries)
+            _xml_file_info[file_id] = (key, new_stamp, new_entries)
+            cached_files = _get_xml_cache().get(key, {})
+            if new_stamp is None:
+                cached_files.pop(fname, None)
+            else:
+                cached_files[fname] = (new_stamp, new_entries)
+        if changed:
+            _save_xml_cache(_get_xml_cache())
+    return changed
+
+
+def watch_xml_records(interval):
+    # type: (float) -> None
+    """Keep refreshing the XML index. Meant to run in a background thread.
+
+    This polls file modification times. That's cheap enough for a few
+    thousand files, and it works everywhere.
+    """
+    wait_ready()
+    while True:
+        time.sleep(interval)
+        refresh_xml_records()
+
+
+def _scan_xml_modules(jobs):
+    # type: (t.List[_XmlJob]) -> t.Iterator[t.List[t.List[_XmlEntry]]]
+    """Scan the files of (module, fnames) pairs, in a process pool if it's worth it.
+
+    Parsing XML is CPU-bound, so a thread would only slow down the REPL.
+    Results are yielded in order as soon as they're ready.
+    """
+    processes = config.xml_processes
+    if not processes:
+        try:
+            processes = multiprocessing.cpu_count()
+        except NotImplementedError:
+            processes = 1
+    processes = min(processes, sum(len(fnames) for _, fnames in jobs))
+    if processes > 1:
+        try:
+            pool = _pool_context().Pool(processes)
+        except (OSError, ImportError, RuntimeError):
+            # E.g. no /dev/shm, no working semaphore implementation, or a
+            # main module that can't be imported again by the workers
+            pass
+        else:
+            try:
+                for result in pool.imap(_scan_xml_job, jobs):
+                    yield result
+            finally:
+                pool.close()
+                pool.join()
+            return
+    for job in jobs:
+        yield _scan_xml_job(job)
+
+
+def _pool_context():
+    # type: () -> t.Any
+    """Get a way to start worker processes that's safe from a thread.
+
+    This runs in a background thread, and forking a process with multiple
+    threads can deadlock the child. A forkserver is forked while it only
+    has one thread, and it imports this module once for all workers.
+    """
+    if not PY3:
+        # Python 2 can only fork
+        return multiprocessing
+    if "forkserver" in multiprocessing.get_all_start_methods():
+        context = multiprocessing.get_context("forkserver")
+        context.set_forkserver_preload([__name__])
+        return context
+    return multiprocessing.get_context("spawn")
+
+
+def _scan_xml_job(job):
+    # type: (_XmlJob) -> t.List[t.List[_XmlEntry]]
+    # Only module-level functions can be sent to a worker process
+    module, fnames = job
+    return [_scan_xml_file(module, fname) for fname in fnames]
+
+
+def _scan_xml_file(module, fname):
+    # type: (t.Text, t.Text) -> t.List[_XmlEntry]
+    """Find the records defined in a data file.
+
+    All the record tags are collected in a single traversal of the tree.
+    """
+    import lxml.etree
+
+    try:
+        tree = lxml.etree.parse(fname)
+    except Exception:  # Syntax error, for example
+        return []
+    return _scan_xml_tree(module, tree)
+
+
+def _scan_xml_tree(module, tree):
+    # type: (t.Text, _ElementTree) -> t.List[_XmlEntry]
+    entries = []
+    for record in tree.iter(*RECORD_TAGS):
+        if "id" not in record.attrib:
+            continue
+        rec_id = record.attrib["id"]
+        if "." not in rec_id:
+            rec_module, rec_name = module, rec_id
+        else:
+            rec_module, rec_name = rec_id.split(".")
+        entries.append(
+            (
+                rec_module,
+                rec_name,
+                record.sourceline,
+                _next_line(record),
+                _RECORD_TAGS[record.tag],
+            )
+        )
+    return entries
+
+
+def _next_line(elem):
+    # type: (_Element) -> t.Optional[int]
+    """Find the line on which the next element after elem starts, if any."""
+    while elem is not None:
+        following = elem.getnext()
+        if following is not None:
+            return following.sourceline  # type: ignore
+        elem = elem.getparent()
+    return None
+
+
+def _parse_fragment(fname, lnum, end_lnum, tag):
+    # type: (t.Text, int, t.Optional[int], t.Text) -> t.Optional[_Element]
+    """Parse an element from only the lines it's on.
+
+    This can be fooled by multiple elements on a single line, or by namespaces
+    declared further up. It returns None when it notices something is off,
+    but the caller should check that the element has the right id.
+    """
+    import lxml.etree
+
+    try:
+        with open(fname, "rb") as f:
+            lines = list(itertools.islice(f, lnum - 1, end_lnum))
+    except (IOError, OSError):
+        return None
+    if not lines:
+        return None
+    start = lines[0].find(b"<" + tag.encode("ascii"))
+    if start == -1:
+        return None
+    lines[0] = lines[0][start:]
+    # Whatever comes after the element is discarded by the recovering parser
+    parser = lxml.etree.XMLParser(recover=True)
+    try:
+        elem = lxml.etree.fromstring(b"".join(lines), parser)
+    except lxml.etree.XMLSyntaxError:
+        return None
+    if elem is None or elem.tag != tag:
+        return None
+    return elem  # type: ignore
+
+
+def _find_element(fname, lnum, xml_id):
+    # type: (t.Text, int, util.XmlId) -> t.Optional[_Element]
+    import lxml.etree
+
+    try:
+        tree = lxml.etree.parse(fname)
+    except Exception:
+        return None
+    for elem in tree.iter(*RECORD_TAGS):
+        if elem.sourceline == lnum and _has_xml_id(elem, xml_id):
+            return elem
+    return None
+
+
+def _has_xml_id(elem, xml_id):
+    # type: (_Element, util.XmlId) -> bool
+    # Records in a module's own files can leave out the module name
+    return elem.get("id") in {xml_id.name, u"{}.{}".format(*xml_id)}
+
+
+def _load_xml_cache():
+    # type: () -> _XmlCache
+    if not config.xml_cache:
+        return {}
+    try:
+        with open(config.xml_cache, "rb") as f:
+            version, cache = pickle.load(f)
+    except Exception:
+        # Missing, unreadable, or written by an incompatible Python version
+        return {}
+    if version != XML_CACHE_VERSION:
+        return {}
+    return cache  # type: ignore
+
+
+def _save_xml_cache(cache):
+    # type: (_XmlCache) -> None
+    if not config.xml_cache:
+        return
+    # Write to a temporary file first so that concurrent sessions never see
+    # a half-written cache
+    tmp_fname = "{}.{}.tmp".format(config.xml_cache, os.getpid())
+    try:
+        dirname = os.path.dirname(config.xml_cache)
+        if dirname and not os.path.isdir(dirname):
+            os.makedirs(dirname)
+        with open(tmp_fname, "wb") as f:
+            # Protocol 2 is understood by both Python 2 and 3
+            pickle.dump((XML_CACHE_VERSION, cache), f, protocol=2)
+        os.rename(tmp_fname, config.xml_cache)
+    except (IOError, OSError):
+        pass
 
 
 def _cleandoc(doc):
@@ -18,8 +18,12 @@ case though.
 
 from __future__ import print_function
 
+import datetime
 import io
+import json
+import os
 import sys
+import tempfile
 
 from contextlib import contextmanager
 from unittest import TestCase, defaultTestLoader, TextTestRunner, TestResult
@@ -29,7 +33,10 @@ from psycopg2.errors import SyntaxError as PGSyntaxError
 import odoo_repl
 
 from odoo_repl import config
+from odoo_repl import export
 from odoo_repl import odoo_repr
+from odoo_repl import records
+from odoo_repl import search
 from odoo_repl import util
 from odoo_repl.imports import t, PY3, cast, odoo, Text  # noqa: F401
 
@@ -70,8 +77,7 @@ class TestOdooRepl(TestCase):
         self.assertIn("demo", dir(self.u))
 
     def test_record_repr(self):
-        if odoo_repl.xml_thread:
-            odoo_repl.xml_thread.join()
+        # Sources should be found even if the XML index isn't ready yet
         rep = odoo_repl.odoo_repr(self.u.demo)
         self.assertRegex(rep, r"^res.users\[\d*\] \(ref.base.user_demo\)\n")
         self.assertRegex(
@@ -201,12 +207,185 @@ Defines: [^\n]*, res.users, """,
     def test_modelproxy(self):
         res_users = self.env["res.users"]
         self.assertGreater(len(res_users), 1)
+        self.assertEqual(res_users.count_(), len(res_users))
+        # Small tables are always counted exactly
+        self.assertEqual(res_users.count_(approx=True), len(res_users))
         self.assertIn("demo", res_users.mapped("login"))
         self.assertEqual(res_users.filtered_(login="demo"), self.u.demo)
         self.assertEqual(res_users.filtered(lambda u: u.login == "demo"), self.u.demo)
+        self.assertIn(self.u.demo.partner_id, res_users.mapped("partner_id"))
+        self.assertIn(self.u.demo.partner_id.name, res_users.mapped("partner_id.name"))
+        self.assertIn(self.u.demo, res_users.filtered("partner_id"))
+        # ir.attachment's _search() hides field attachments
+        attachments = self.real_env["ir.attachment"].search([], order="id")
+        self.assertEqual(
+            self.env["ir.attachment"].mapped("name"), attachments.mapped("name")
+        )
+        for filtered in (
+            res_users.filtered("partner_id"),
+            res_users.filtered_(login__ne="demo"),
+            res_users.filtered(lambda u: u.login != "demo"),
+        ):
+            self.assertEqual(filtered.ids, sorted(filtered.ids))
+        self.assertEqual(res_users._().filtered_(login__in=["demo"]), self.u.demo)
+        self.assertNotIn(self.u.demo, res_users._().filtered_(login__ne="demo"))
+        self.assertEqual(
+            res_users.filtered_(lambda u: u.login == "demo", login__ne="admin"),
+            self.u.demo,
+        )
         self.assertEqual(repr(res_users), "<ModelProxy(res.users)>")
         self.assertEqual(res_users.mod_().model, "res.users")
         self.assertEqual(len(res_users.shuf_(2)), 2)
+        self.assertEqual(res_users._(login="demo", shuf=1), self.u.demo)
+        self.assertIn(self.u.demo, res_users[: self.u.demo.id + 1])
+        self.assertNotIn(self.u.demo, res_users[self.u.demo.id + 1 :])
+        first = res_users.page_(size=1)
+        self.assertEqual(first, res_users._(limit=1, order="id"))
+        self.assertGreater(res_users.page_(first, size=1).id, first.id)
+
+    def test_xml_id_cache(self):
+        demo = self.u.demo
+        self.assertIn(util.XmlId("base", "user_demo"), util.xml_ids(demo))
+        data = self.real_env["ir.model.data"].search(
+            [("module", "=", "base"), ("name", "=", "user_demo")]
+        )
+        # Changes in the same transaction have the same write_date
+        data.write({"name": "user_demo_renamed"})
+        try:
+            found = util.xml_ids(demo)
+            self.assertIn(util.XmlId("base", "user_demo_renamed"), found)
+            self.assertNotIn(util.XmlId("base", "user_demo"), found)
+        finally:
+            data.write({"name": "user_demo"})
+        self.assertIn(util.XmlId("base", "user_demo"), util.xml_ids(demo))
+
+    def test_filtered_x2many(self):
+        users = self.env["res.users"]._()
+        group_ids = self.u.demo.groups_id[:2].ids
+        by_domain = users.filtered_(groups_id__in=group_ids)
+        self.assertIn(self.u.demo, by_domain)
+        for op, expected in (("in", by_domain), ("not in", users - by_domain)):
+            self.assertEqual(
+                users.filtered(
+                    lambda user: search.matches(user, "groups_id", op, group_ids)
+                ),
+                expected,
+            )
+
+    def test_filtered_numbers(self):
+        partners = self.env["res.partner"]._()
+        # Unset integers are NULL in the database and 0 in Python
+        for field_vals, func in (
+            ({"color": 0}, lambda partner: partner.color == 0),
+            ({"color__ne": 0}, lambda partner: partner.color != 0),
+            ({"color__lt": 1}, lambda partner: partner.color < 1),
+            ({"color__not_in": [1]}, lambda partner: partner.color not in [1]),
+        ):
+            self.assertEqual(partners.filtered_(**field_vals), partners.filtered(func))
+
+    def test_table(self):
+        users = self.env["res.users"]._(login__in=["admin", "demo"])
+        with self.capture_stdout():
+            users.table_("login", pager=False)
+        lines = self._captured_stream.getvalue().splitlines()
+        self.assertEqual([line.split() for line in lines[:1]], [["id", "login"]])
+        self.assertEqual(
+            [line.split() for line in lines[1:]],
+            [[str(user.id), user.login] for user in users],
+        )
+
+        # The pager gets the same lines, without blank lines in between
+        fd, fname = tempfile.mkstemp()
+        os.close(fd)
+        old_pager = config.pager
+        config.pager = ("sh", "-c", "cat > {}".format(fname))
+        try:
+            users.table_("login", pager=True)
+            with io.open(fname, encoding="utf-8") as f:
+                self.assertEqual(f.read().splitlines(), lines)
+        finally:
+            config.pager = old_pager
+            os.remove(fname)
+
+    def test_export_values(self):
+        fields = self.real_env["res.users"]._fields
+        names = ["id", "login", "partner_id", "active", "groups_id", "write_date"]
+        users_fields = [fields[name] for name in names]
+        stamp = datetime.datetime(2020, 1, 2, 3, 4, 5)
+        row = [
+            export._convert(value, field)
+            for value, field in zip(
+                [3, "demo", (7, "Demo"), None, [1, 2], "2020-01-02 03:04:05"],
+                users_fields,
+            )
+        ]
+        self.assertEqual(row, [3, "demo", 7, False, [1, 2], stamp])
+        self.assertIsNone(export._convert(False, fields["login"]))
+        self.assertEqual(export._convert(7, fields["partner_id"], {7: "Demo"}), "Demo")
+        ref_fields = [
+            field
+            for model in self.real_env.registry.values()
+            for field in model._fields.values()
+            if field.type == "many2one_reference"
+        ]
+        if ref_fields:
+            self.assertEqual(export._convert(5, ref_fields[0]), 5)
+
+        fd, fname = tempfile.mkstemp()
+        os.close(fd)
+        try:
+            self.assertEqual(export._write_csv(fname, users_fields, [[row]], "id"), 1)
+            with io.open(fname, encoding="utf-8", newline="") as f:
+                self.assertEqual(
+                    f.read(),
+                    "id,login,partner_id,active,groups_id,write_date\r\n"
+                    '3,demo,7,False,"1,2",2020-01-02T03:04:05\r\n',
+                )
+            self.assertEqual(
+                export._write_jsonl(fname, users_fields, [[row], [row]], "id"), 2
+            )
+            with io.open(fname, encoding="utf-8") as f:
+                lines = [json.loads(line) for line in f]
+            self.assertEqual(len(lines), 2)
+            self.assertEqual(
+                lines[0],
+                {
+                    "id": 3,
+                    "login": "demo",
+                    "partner_id": 7,
+                    "active": False,
+                    "groups_id": [1, 2],
+                    "write_date": "2020-01-02T03:04:05",
+                },
+            )
+        finally:
+            os.remove(fname)
+
+    def test_skipped_fields(self):
+        demo = self.u.demo
+        key = (demo._name, demo.id)
+        old_budget = config.field_budget
+        config.field_budget = 1e-9
+        try:
+            # The first time the timings are recorded, after that every
+            # field is too slow
+            odoo_repr(demo)
+            with self.capture_stdout():
+                print(odoo_repr(demo))
+            self.assertCaptured("<skipped: ")
+            self.assertIn(key, records.skipped_fields)
+            with self.capture_stdout():
+                demo.timings_()
+            self.assertCaptured(r"login: +\d+\.\d+s \(skipped\)")
+            with self.capture_stdout():
+                demo.force_()
+            self.assertCaptured(r"login: +demo")
+            self.assertNotCaptured("<skipped")
+            self.assertNotIn(key, records.skipped_fields)
+        finally:
+            config.field_budget = old_budget
+            records.field_timings.clear()
+            records.skipped_fields.clear()
 
     def test_create_write_info(self):
         demo = self.env["res.users"].search([("login", "=", "demo")])
@@ -249,6 +428,13 @@ Written on 20..-..-.. ..:..:.. by u.demo""",
         self.assertCaptured(r"def has_group\(")
         self.assertNotCaptured(r"class BaseModel")
 
+    def test_xml_index_ready(self):
+        self.assertTrue(odoo_repl.sources.wait_ready(timeout=600))
+        indexed, total = odoo_repl.sources.xml_progress()
+        self.assertEqual(indexed, total)
+        self.assertIn("base", odoo_repl.sources.xml_modules)
+        self.assertTrue(odoo_repl.sources.xml_records[util.XmlId("base", "user_demo")])
+
     @slow
     def test_repr_all_models(self):
         for model in self.ns["env"]:
@@ -281,8 +467,7 @@ Written on 20..-..-.. ..:..:.. by u.demo""",
 
     @slow
     def test_repr_all_data(self):
-        if odoo_repl.xml_thread:
-            odoo_repl.xml_thread.join()
+        self.assertTrue(odoo_repl.sources.wait_ready(timeout=600))
         for xml_id in odoo_repl.sources.xml_records.copy():
             try:
                 record = self.real_env.ref(str(xml_id))
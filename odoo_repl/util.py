@@ -4,13 +4,20 @@ from __future__ import unicode_literals
 
 import collections
 import contextlib
+import errno
+import functools
+import importlib
 import itertools
+import json
 import keyword
+import os
 import string
 import subprocess
+import time
 
 import odoo_repl
 
+from odoo_repl import config
 from odoo_repl.imports import (
     t,
     overload,
@@ -20,6 +27,7 @@ from odoo_repl.imports import (
     PY3,
     BaseModel,
     AnyModel,
+    Text,
     cast,
 )
 
@@ -53,6 +61,12 @@ class XmlId(_XmlId):
         return "ref.{}.{}".format(self.module, self.name)
 
 
+if MYPY:
+    # (model name, record id) -> XML ids
+    _XmlIdMap = t.Dict[t.Tuple[t.Text, int], t.List[XmlId]]
+    _XmlIdEntries = collections.OrderedDict[t.Tuple[t.Text, int], t.List[XmlId]]
+
+
 IDENT_CHARS = set(string.ascii_letters + string.digits + "_")
 
 
@@ -74,15 +88,10 @@ def xml_ids(obj):
 
     .get_external_id() returns at most one result per record.
     """
-    ids = [
-        XmlId(data_record.module, data_record.name)
-        for data_record in (
-            obj.env["ir.model.data"]
-            .sudo()
-            .search([("model", "=", obj._name), ("res_id", "in", obj.ids)])
-        )
-        if data_record.module != "__export__"
-    ]
+    found = bulk_xml_ids(obj.env, [(obj._name, obj.ids)])
+    ids = list(itertools.chain.from_iterable(found.values()))
+    # bulk_xml_ids sorts per record, but here they're sorted together
+    ids.sort(key=lambda xml_id: (xml_id.module, xml_id.name))
     # Note: checking that obj is not empty prevents infinite recursion
     # It's not a silly optimization
     if obj and obj._name == "ir.ui.view":
@@ -96,6 +105,208 @@ def xml_ids(obj):
     return ids
 
 
+def bulk_xml_ids(
+    env_,  # type: odoo.api.Environment
+    records,  # type: t.Iterable[t.Tuple[t.Text, t.Iterable[t.Any]]]
+):
+    # type: (...) -> _XmlIdMap
+    """Look up the XML ids of many records, with at most a few queries.
+
+    Takes (model name, ids) pairs and returns a dict from (model name, id)
+    to XML ids. Records without XML ids are left out. NewIds are ignored.
+
+    Unlike xml_ids(), this doesn't add the XML ids of inheriting views.
+    """
+    by_model = collections.defaultdict(set)  # type: t.Dict[t.Text, t.Set[int]]
+    for model_name, ids in records:
+        by_model[model_name].update(
+            ident for ident in ids if not isinstance(ident, odoo.models.NewId)
+        )
+    if config.xml_id_cache_size <= 0:
+        return _query_xml_ids(env_, by_model)
+    return xml_id_cache.lookup(env_, by_model)
+
+
+def _query_xml_ids(env_, by_model):
+    # type: (odoo.api.Environment, t.Dict[t.Text, t.Set[int]]) -> _XmlIdMap
+    clauses = []
+    args = []  # type: t.List[object]
+    for model_name, id_set in by_model.items():
+        if id_set:
+            clauses.append("(model = %s AND res_id IN %s)")
+            args.extend([model_name, tuple(id_set)])
+    if not clauses:
+        return {}
+    rows = sql(
+        env_,
+        "SELECT model, res_id, module, name FROM ir_model_data "
+        "WHERE module != '__export__' AND ({}) "
+        "ORDER BY module, model, name".format(" OR ".join(clauses)),
+        *args
+    )
+    result = {}  # type: _XmlIdMap
+    for model_name, res_id, data_module, name in rows:
+        result.setdefault((model_name, res_id), []).append(XmlId(data_module, name))
+    return result
+
+
+class XmlIdCache(object):
+    """A bounded LRU cache of the XML ids of records.
+
+    Records without XML ids are cached too. Models with few XML ids are
+    loaded in full the first time one of their records is looked up.
+
+    Everything is forgotten when ir_model_data changes. Changes made through
+    the ORM in this process clear the cache right away, other changes are
+    noticed at most CHECK_INTERVAL seconds later.
+    """
+
+    CHECK_INTERVAL = 1.0
+    # Models with more XML ids than this are looked up one query at a time
+    MODEL_LIMIT = 1000
+
+    def __init__(self):
+        # type: () -> None
+        self.entries = collections.OrderedDict()  # type: _XmlIdEntries
+        # Models whose XML ids are all in entries
+        self.complete = set()  # type: t.Set[t.Text]
+        # Models that have too many XML ids to load in full
+        self.too_big = set()  # type: t.Set[t.Text]
+        self.stamp = None  # type: t.Optional[t.Tuple[object, ...]]
+        self.checked = 0.0
+
+    def clear(self):
+        # type: () -> None
+        self.entries.clear()
+        self.complete.clear()
+        self.too_big.clear()
+
+    def check(self, env_):
+        # type: (odoo.api.Environment) -> None
+        """Clear the cache if ir_model_data changed, or if the database did."""
+        now = time.time()
+        if now - self.checked < self.CHECK_INTERVAL:
+            return
+        count, write_date = sql(
+            env_, "SELECT count(*), max(write_date) FROM ir_model_data"
+        )[0]
+        stamp = (env_.cr.dbname, count, write_date)
+        if stamp != self.stamp:
+            self.clear()
+            self.stamp = stamp
+        self.checked = now
+
+    def get(self, key):
+        # type: (t.Tuple[t.Text, int]) -> t.Optional[t.List[XmlId]]
+        """Return the XML ids of a record, or None if they're not known."""
+        if key in self.entries:
+            # Move to the end, to mark it as recently used
+            self.entries[key] = self.entries.pop(key)
+            return self.entries[key]
+        if key[0] in self.complete:
+            return []
+        return None
+
+    def put(self, key, ids):
+        # type: (t.Tuple[t.Text, int], t.List[XmlId]) -> None
+        self.entries.pop(key, None)
+        self.entries[key] = ids
+        while len(self.entries) > config.xml_id_cache_size:
+            (model_name, _), _ = self.entries.popitem(last=False)
+            self.complete.discard(model_name)
+
+    def lookup(self, env_, by_model):
+        # type: (odoo.api.Environment, t.Dict[t.Text, t.Set[int]]) -> _XmlIdMap
+        self.check(env_)
+        result = {}  # type: _XmlIdMap
+        missing = {}  # type: t.Dict[t.Text, t.Set[int]]
+        for model_name, ids in by_model.items():
+            for ident in ids:
+                found = self.get((model_name, ident))
+                if found is None:
+                    missing.setdefault(model_name, set()).add(ident)
+                elif found:
+                    result[model_name, ident] = found
+        for model_name in list(missing):
+            if model_name in self.too_big or not self._load_model(env_, model_name):
+                continue
+            for ident in missing.pop(model_name):
+                found = self.get((model_name, ident))
+                if found:
+                    result[model_name, ident] = found
+        if missing:
+            queried = _query_xml_ids(env_, missing)
+            for model_name, ids in missing.items():
+                for ident in ids:
+                    found = queried.get((model_name, ident), [])
+                    self.put((model_name, ident), found)
+                    if found:
+                        result[model_name, ident] = found
+        return result
+
+    def _load_model(self, env_, model_name):
+        # type: (odoo.api.Environment, t.Text) -> bool
+        rows = sql(
+            env_,
+            "SELECT res_id, module, name FROM ir_model_data "
+            "WHERE model = %s AND module != '__export__' "
+            "ORDER BY module, name LIMIT %s",
+            model_name,
+            self.MODEL_LIMIT + 1,
+        )
+        if len(rows) > min(self.MODEL_LIMIT, config.xml_id_cache_size):
+            self.too_big.add(model_name)
+            return False
+        loaded = collections.OrderedDict()  # type: t.Dict[int, t.List[XmlId]]
+        for res_id, data_module, name in rows:
+            loaded.setdefault(res_id, []).append(XmlId(data_module, name))
+        for res_id, ids in loaded.items():
+            self.put((model_name, res_id), ids)
+        self.complete.add(model_name)
+        return True
+
+
+xml_id_cache = XmlIdCache()
+
+
+def _ir_model_data_class():
+    # type: () -> t.Optional[t.Type[BaseModel]]
+    for module_name, class_name in [
+        ("odoo.addons.base.models.ir_model", "IrModelData"),
+        ("odoo.addons.base.ir.ir_model", "IrModelData"),
+        ("openerp.addons.base.ir.ir_model", "ir_model_data"),
+    ]:
+        try:
+            module = importlib.import_module(module_name)
+        except ImportError:
+            continue
+        return getattr(module, class_name, None)
+    return None
+
+
+def _clears_xml_id_cache(method):
+    # type: (C) -> C
+    @functools.wraps(method)
+    def wrapper(*args, **kwargs):
+        # type: (t.Any, t.Any) -> t.Any
+        try:
+            return method(*args, **kwargs)
+        finally:
+            xml_id_cache.clear()
+
+    return cast("C", wrapper)
+
+
+def record_xml_ids(obj):
+    # type: (BaseModel) -> t.Dict[object, t.List[XmlId]]
+    """Map each record's id to the same XML ids as xml_ids(record)."""
+    if obj._name == "ir.ui.view":
+        # Inheriting views make this complicated, but these are rarely bulk
+        return {rec.id: xml_ids(rec) for rec in obj}
+    found = bulk_xml_ids(obj.env, [(obj._name, obj._ids)])
+    return {ident: found.get((obj._name, ident), []) for ident in obj._ids}
+
+
 def xml_id_tag(obj):
     # type: (BaseModel) -> t.Text
     """Return an affix for an object's XML ID, if it has one."""
@@ -140,6 +351,115 @@ def savepoint(cr):
         cr.execute("RELEASE SAVEPOINT {}".format(name))
 
 
+# Set when Ctrl-C cancels a query inside interruptible()
+query_interrupted = False
+
+
+def _wait_select(conn):
+    # type: (t.Any) -> None
+    """Like psycopg2.extras.wait_select, but remember cancelled queries."""
+    global query_interrupted
+    import select
+    from psycopg2.extensions import POLL_OK, POLL_READ, POLL_WRITE
+
+    while True:
+        try:
+            state = conn.poll()
+            if state == POLL_OK:
+                break
+            elif state == POLL_READ:
+                select.select([conn.fileno()], [], [])
+            elif state == POLL_WRITE:
+                select.select([], [conn.fileno()], [])
+            else:
+                raise conn.OperationalError("bad state from poll: {}".format(state))
+        except KeyboardInterrupt:
+            conn.cancel()
+            query_interrupted = True
+            # The server reports an error once the query is cancelled
+            continue
+
+
+@contextlib.contextmanager
+def interruptible(env_):
+    # type: (t.Optional[odoo.api.Environment]) -> t.Iterator[None]
+    """Make Ctrl-C cancel running queries, and undo the block if it's pressed.
+
+    A cancelled query aborts the transaction, so everything since the start
+    of the block is rolled back and KeyboardInterrupt is raised at the end,
+    even if the code in the block caught the error. Odoo's cache is cleared
+    as well, because it may hold values computed in the meantime.
+
+    Cancelling works through a psycopg2 wait callback, which applies to the
+    whole process. It's only installed for the duration of the block, and
+    not at all if another one is already installed.
+    """
+    global query_interrupted
+    query_interrupted = False
+    try:
+        import psycopg2.extensions
+    except ImportError:
+        psycopg2 = None
+    if psycopg2 is None or env_ is None:
+        yield
+        return
+    if psycopg2.extensions.get_wait_callback() is not None:
+        yield
+        return
+    psycopg2.extensions.set_wait_callback(_wait_select)
+    try:
+        with _rollback_on_interrupt(env_, psycopg2.Error):
+            yield
+    finally:
+        psycopg2.extensions.set_wait_callback(None)
+
+
+@contextlib.contextmanager
+def _rollback_on_interrupt(env_, db_error):
+    # type: (odoo.api.Environment, t.Type[Exception]) -> t.Iterator[None]
+    global query_interrupted
+    cr = env_.cr._obj  # Avoid logging
+    name = "odoo_repl_savepoint_{}".format(next(_savepoint_count))
+    try:
+        cr.execute("SAVEPOINT {}".format(name))
+        have_savepoint = True
+    except db_error:
+        # The transaction is already aborted, or the cursor is closed
+        have_savepoint = False
+    if not have_savepoint:
+        yield
+        return
+    query_interrupted = False
+    try:
+        yield
+    except BaseException as err:
+        cr.execute("ROLLBACK TO SAVEPOINT {}".format(name))
+        if query_interrupted or isinstance(err, KeyboardInterrupt):
+            invalidate_cache(env_)
+            raise KeyboardInterrupt
+        raise
+    if query_interrupted:
+        cr.execute("ROLLBACK TO SAVEPOINT {}".format(name))
+        invalidate_cache(env_)
+        raise KeyboardInterrupt
+    cr.execute("RELEASE SAVEPOINT {}".format(name))
+
+
+def invalidate_cache(env_):
+    # type: (odoo.api.Environment) -> None
+    if hasattr(env_, "invalidate_all"):
+        env_.invalidate_all()
+
+
+def flush(env_):
+    # type: (odoo.api.Environment) -> None
+    """Write pending ORM changes to the database, so raw SQL can see them."""
+    if hasattr(env_, "flush_all"):
+        env_.flush_all()
+    elif hasattr(BaseModel, "flush"):
+        env_["base"].flush()
+
+
 def sql(env_, query, *args):
     # type: (odoo.api.Environment, t.Text, object) -> t.List[t.Any]
     """Execute a SQL query and make the result more convenient.
@@ -155,6 +475,108 @@ def sql(env_, query, *args):
     return result
 
 
+def iter_records(model, domain=(), chunk_size=None):
+    # type: (BaseModel, t.Iterable[t.Any], t.Optional[int]) -> t.Iterator[BaseModel]
+    """Iterate over matching records a chunk at a time, in order of id.
+
+    See iter_chunks. Fields are prefetched for one chunk at a time.
+    """
+    for chunk in iter_chunks(model, domain, chunk_size):
+        for record in chunk:
+            yield record
+
+
+def iter_chunks(model, domain=(), chunk_size=None):
+    # type: (BaseModel, t.Iterable[t.Any], t.Optional[int]) -> t.Iterator[BaseModel]
+    """Search for matching records in chunks, in order of id.
+
+    Each chunk is searched for by id after the previous one, so the ids of
+    all records are never loaded at once. The cache is cleared between
+    chunks to keep memory use bounded.
+
+    Only records that existed when iteration started are included, so
+    records created while iterating don't get picked up.
+    """
+    size = max(chunk_size or config.chunk_size, 1)
+    domain = list(domain)
+    last = model.search(domain, order="id desc", limit=1)
+    if not last:
+        return
+    domain.append(("id", "<=", last.id))
+    last_id = 0
+    while True:
+        chunk = model.search(domain + [("id", ">", last_id)], order="id", limit=size)
+        if not chunk:
+            return
+        yield chunk
+        last_id = chunk._ids[-1]
+        if len(chunk) < size:
+            return
+        flush(model.env)
+        invalidate_cache(model.env)
+
+
+def bypasses_rules(env_):
+    # type: (odoo.api.Environment) -> bool
+    """Whether record rules don't apply, so raw SQL sees the same records."""
+    if hasattr(env_, "su"):
+        return bool(env_.su)
+    return env_.uid == odoo.SUPERUSER_ID
+
+
+def active_column(model):
+    # type: (BaseModel) -> t.Optional[t.Text]
+    """The stored column that search() filters on by default, if any."""
+    if not model._context.get("active_test", True):
+        return None
+    name = getattr(model, "_active_name", None) or "active"
+    field = model._fields.get(name)
+    if field is None or not field.store or getattr(field, "related", None):
+        return None
+    return name
+
+
+# Field types whose column holds the same value the ORM reads
+# (many2one columns hold the id)
+COLUMN_TYPES = {
+    "char",
+    "text",
+    "html",
+    "selection",
+    "integer",
+    "float",
+    "monetary",
+    "boolean",
+    "date",
+    "datetime",
+    "many2one",
+}
+
+
+def is_plain_column(field):
+    # type: (Field) -> bool
+    """Whether the field's value can be selected straight from its column."""
+    return bool(
+        field.store
+        and field.type in COLUMN_TYPES
+        and not getattr(field, "translate", False)
+        and not getattr(field, "company_dependent", False)
+    )
+
+
+def estimate_count(model):
+    # type: (BaseModel) -> int
+    """Ask the query planner how many rows a search([]) would find."""
+    query = 'SELECT id FROM "{}"'.format(model._table)
+    active = active_column(model)
+    if active:
+        query += ' WHERE "{}" = true'.format(active)
+    plan = sql(model.env, "EXPLAIN (FORMAT JSON) " + query)[0]
+    if isinstance(plan, Text):
+        plan = json.loads(plan)
+    return int(plan[0]["Plan"]["Plan Rows"])
+
+
 if MYPY:
     T = t.TypeVar("T", BaseModel, Field, t.Callable[..., t.Any])
 
@@ -232,6 +654,44 @@ def open_browser(url):
     subprocess.Popen(["xdg-open", url])
 
 
+def page(texts, separator="\n"):
+    # type: (t.Iterable[t.Text], t.Text) -> bool
+    """Write texts to the pager, or return False if it can't be started.
+
+    Each text is followed by a newline, and separator is written between
+    them.
+    """
+    env = os.environ.copy()
+    # Like git: quit if it fits on one screen, pass colors, don't clear
+    env.setdefault(str("LESS"), str("FRX"))
+    try:
+        proc = subprocess.Popen(config.pager, stdin=subprocess.PIPE, env=env)
+    except OSError:
+        return False
+    assert proc.stdin is not None
+    try:
+        first = True
+        for text in texts:
+            if not first:
+                text = separator + text
+            first = False
+            proc.stdin.write((text + "\n").encode("utf-8"))
+            proc.stdin.flush()
+    except IOError as err:
+        # The pager was quit, so the rest doesn't have to be rendered
+        if err.errno != errno.EPIPE:
+            raise
+    except KeyboardInterrupt:
+        pass
+    finally:
+        try:
+            proc.stdin.close()
+        except IOError:
+            pass
+        proc.wait()
+    return True
+
+
 def is_record(obj):
     # type: (object) -> bool
     """Return whether an object is an Odoo record."""
@@ -283,3 +743,11 @@ else:
         if not isinstance(text, bytes):
             return text
         return text.decode("utf8", errors="replace")
+
+
+# The database check can't see changes made in our own transaction, because
+# write_date is the same for all of them
+_IrModelData = _ir_model_data_class()
+if _IrModelData is not None:
+    for _name in ("create", "write", "unlink"):
+        patch(_IrModelData, _name, _clears_xml_id_cache(getattr(_IrModelData, _name)))
@@ -0,0 +1,130 @@
+"""Precompute source information for models in the background.
+
+Configured through config.warmup. Model names are warmed as given, and
+"auto" stands for the models that were used most in earlier sessions.
+
+Only class-level information is gathered: source locations, the modules
+that define fields and method override chains. The database cursor is
+not thread-safe, so the background thread never touches it.
+"""
+
+import atexit
+import collections
+import json
+import os
+import threading
+import time
+
+import odoo_repl
+
+from odoo_repl import config
+from odoo_repl import sources
+from odoo_repl import util
+from odoo_repl.imports import odoo, t, BaseModel
+
+# How many models "auto" expands to
+AUTO_MODELS = 10
+
+usage = collections.Counter()  # type: t.Counter[t.Text]
+_usage_saved = False
+
+
+def usage_file():
+    # type: () -> t.Text
+    return os.path.join(config.cache_dir, "model_usage.json")
+
+
+def record_use(model_name):
+    # type: (t.Text) -> None
+    """Count a model or its records being displayed."""
+    if config.warmup:
+        usage[model_name] += 1
+
+
+def load_usage():
+    # type: () -> t.Counter[t.Text]
+    try:
+        with open(usage_file()) as f:
+            return collections.Counter(json.load(f))
+    except (IOError, OSError, ValueError, TypeError):
+        return collections.Counter()
+
+
+def save_usage():
+    # type: () -> None
+    """Add this session's usage counts to the ones on disk."""
+    global _usage_saved
+    if _usage_saved or not usage:
+        return
+    _usage_saved = True
+    total = load_usage()
+    total.update(usage)
+    fname = usage_file()
+    tmp_fname = "{}.{}.tmp".format(fname, os.getpid())
+    try:
+        if not os.path.isdir(config.cache_dir):
+            os.makedirs(config.cache_dir)
+        with open(tmp_fname, "w") as f:
+            json.dump(dict(total), f)
+        os.rename(tmp_fname, fname)
+    except (IOError, OSError):
+        pass
+
+
+def models_to_warm(env):
+    # type: (odoo.api.Environment) -> t.List[t.Text]
+    names = []  # type: t.List[t.Text]
+    for name in config.warmup:
+        if name == "auto":
+            names.extend(model for model, _ in load_usage().most_common(AUTO_MODELS))
+        else:
+            names.append(name)
+    seen = set()  # type: t.Set[t.Text]
+    result = []
+    for name in names:
+        if name not in seen and name in env.registry:
+            seen.add(name)
+            result.append(name)
+    return result
+
+
+def warm_model(model):
+    # type: (BaseModel) -> None
+    """Fill the source caches that displaying the model and its parts use."""
+    odoo_repl.models.model_repr(model)
+    for field in model._fields.values():
+        sources.find_field_source(field)
+    method_names = {
+        name
+        for cls in type(model).__mro__[1:]
+        for name, attr in vars(cls).items()
+        if util.loosely_callable(attr)
+    }
+    for name in sorted(method_names):
+        sources.method_chain(model, name)
+
+
+def _warm_models(env, names):
+    # type: (odoo.api.Environment, t.List[t.Text]) -> None
+    # Let the XML index have the CPU first
+    sources.wait_ready()
+    for name in names:
+        try:
+            warm_model(env[name])
+        except Exception:
+            # Any problem will show up again when the model is used for real
+            pass
+        # Give the main thread a chance to run
+        time.sleep(0.01)
+
+
+def start(env):
+    # type: (odoo.api.Environment) -> t.Optional[threading.Thread]
+    """Start warming up the configured models, if any."""
+    if not config.warmup:
+        return None
+    atexit.register(save_usage)
+    thread = threading.Thread(target=_warm_models, args=(env, models_to_warm(env)))
+    thread.daemon = True
+    thread.start()
+    return thread